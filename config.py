@@ -1,22 +1,69 @@
+import atexit
+import logging
+import logging.handlers
 import os
+import queue
+from dataclasses import dataclass, field
 from dotenv import load_dotenv
 
 load_dotenv()
 
+@dataclass(frozen=True, slots=True)
 class Config:
-    """Конфигурация приложения."""
+    """Конфигурация приложения (читается из окружения один раз при импорте)."""
     
     # Telegram
-    BOT_TOKEN = os.getenv("BOT_TOKEN")
-    ADMIN_ID = int(os.getenv("ADMIN_ID", 0))
+    BOT_TOKEN: str = field(repr=False)
+    ADMIN_ID: int
     
     # Google Sheets
-    SPREADSHEET_ID = os.getenv("SPREADSHEET_ID")
-    SHEET_NAME = os.getenv("SHEET_NAME", "Feedback")
+    SPREADSHEET_ID: str
+    SHEET_NAME: str
     
     # Настройки
-    MAX_FEEDBACK_LENGTH = 10000
-    FEEDBACK_COOLDOWN = 30  # сек
+    MAX_FEEDBACK_LENGTH: int = 10000
+    FEEDBACK_COOLDOWN: int = 30  # сек
+    FEEDBACK_BATCH_SIZE: int = 50  # отзывов в одном запросе к таблице
+    FEEDBACK_FLUSH_DELAY: int = 2  # сек
+    FEEDBACK_DB: str = "feedback.db"  # локальный буфер до записи в таблицу
+    
+    # Хранилище состояний (пусто — в памяти процесса)
+    REDIS_URL: str = ""
+    
+    # Логирование
+    LOG_LEVEL: str = "INFO"
+    
+    @classmethod
+    def from_env(cls) -> "Config":
+        """Сборка конфигурации из переменных окружения."""
+        return cls(
+            BOT_TOKEN=os.getenv("BOT_TOKEN"),
+            ADMIN_ID=int(os.getenv("ADMIN_ID", 0)),
+            SPREADSHEET_ID=os.getenv("SPREADSHEET_ID"),
+            SHEET_NAME=os.getenv("SHEET_NAME", "Feedback"),
+            FEEDBACK_DB=os.getenv("FEEDBACK_DB", "feedback.db"),
+            REDIS_URL=os.getenv("REDIS_URL", ""),
+            LOG_LEVEL=os.getenv("LOG_LEVEL", "INFO").upper(),
+        )
+
+
+def setup_logging():
+    """Логирование через очередь: вывод в консоль идет в отдельном потоке."""
+    log_queue = queue.Queue(-1)
+    
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(logging.Formatter(
+        "%(asctime)s %(levelname)s %(name)s: %(message)s"
+    ))
+    listener = logging.handlers.QueueListener(log_queue, stream_handler)
+    
+    root = logging.getLogger()
+    root.setLevel(config.LOG_LEVEL)
+    root.addHandler(logging.handlers.QueueHandler(log_queue))
+    
+    listener.start()
+    # Дописываем оставшиеся в очереди записи при выходе
+    atexit.register(listener.stop)
 
 
-config = Config()
\ No newline at end of file
+config = Config.from_env()
\ No newline at end of file
@@ -1,97 +1,660 @@
-import gspread
-from google.oauth2.service_account import Credentials
-from datetime import datetime
-from config import Config
+import hashlib
+import json
+import logging
+import random
+import sqlite3
+import threading
+import time
+from collections import Counter, OrderedDict
+from operator import itemgetter
+from config import config
+
+# gspread и google-auth тянут десятки модулей, поэтому импортируются
+# только при первом подключении (см. connect)
+
+logger = logging.getLogger(__name__)
+
+# Накопленная статистика хранится в метаданных разработчика листа:
+# их не видно в таблице и они не занимают ячеек
+STATS_METADATA_KEY = "feedback_bot_stats"
+
+# Ячейка, где статистика лежала раньше (переносится в метаданные и очищается)
+LEGACY_STATS_CELL = "M1"
+
+# Метод spreadsheets.batchUpdate: строки и счетчики пишутся одним запросом
+BATCH_UPDATE_URL = "https://sheets.googleapis.com/v4/spreadsheets/{id}:batchUpdate"
+METADATA_SEARCH_URL = "https://sheets.googleapis.com/v4/spreadsheets/{id}/developerMetadata:search"
+
+# Пул keep-alive соединений к sheets.googleapis.com
+HTTP_POOL_CONNECTIONS = 4
+HTTP_POOL_MAXSIZE = 16
+
+# Повторы при 429/5xx: задержка 1, 2, 4... сек, но не больше RETRY_MAX_DELAY
+RETRY_ATTEMPTS = 6
+RETRY_MAX_DELAY = 60
+
+# Сколько строк из локального буфера отправлять одним запросом
+FLUSH_MAX_ROWS = 500
+
+# Повтор записи буфера после ошибки: 30, 60, 120... сек, но не больше FLUSH_RETRY_MAX_DELAY
+FLUSH_RETRY_DELAY = 30
+FLUSH_RETRY_MAX_DELAY = 600
+
+# Одинаковый отзыв считается дублем (повторной отправкой), если пришел
+# не позже DUPLICATE_WINDOW сек после первого; помним не больше RECENT_FEEDBACK_LIMIT
+DUPLICATE_WINDOW = 300
+RECENT_FEEDBACK_LIMIT = 10_000
+
+# После неудачной загрузки статистики следующая попытка — не раньше, чем через
+STATS_RETRY_DELAY = 30
+
+
+def _sheets_errors():
+    """Ожидаемые ошибки при работе с Google Sheets.
+    
+    Ошибки в коде (TypeError, KeyError...) не перехватываются и видны сразу.
+    Функция, а не константа: gspread импортируется только в connect().
+    """
+    from google.auth.exceptions import GoogleAuthError
+    from gspread.exceptions import GSpreadException
+    from requests import RequestException
+    
+    # OSError покрывает отсутствие credentials.json;
+    # ValueError — поврежденный файл ключа
+    return (GSpreadException, GoogleAuthError, RequestException, OSError, ValueError)
 
 
 class GoogleSheetsManager:
     """Управление Google Sheets."""
     
     def __init__(self):
-        self.config = Config
+        self.config = config
         self.client = None
+        self._session = None
+        self._batch_update_url = None
+        self._metadata_search_url = None
+        self._spreadsheet = None
+        self._worksheet = None
+        
+        # Локальный буфер SQLite с отзывами, ожидающими записи в таблицу
+        self._db = None
+        self._pending_count = 0
+        # id строк, уже записанных в таблицу, но не удаленных из буфера
+        # (ошибка SQLite) — повторно они не отправляются
+        self._sent_ids = set()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._flush_timer = None
+        # Неудачных записей буфера подряд (для задержки повтора)
+        self._flush_failures = 0
+        
+        # Время последнего отзыва по user_id (для FEEDBACK_COOLDOWN)
+        self._last_submit = {}
+        
+        # Хэш отзыва (blake2b) → время записи в буфер, в порядке записи;
+        # для отсева повторной отправки в пределах DUPLICATE_WINDOW
+        self._recent = OrderedDict()
+        
+        # Накопленная статистика: обновляется при каждой записи в таблицу
+        self._stats_state = None
+        self._stats_failed_at = None
+        # Загрузка статистики идет из потоков get_stats и фоновой записи:
+        # без блокировки оба могут создать метаданные со статистикой
+        self._stats_lock = threading.Lock()
+        # metadataId записи со статистикой (None — еще не найдена)
+        self._stats_metadata_id = None
         
     def connect(self):
         """Подключение к Google Sheets."""
         try:
+            self._open()
+        except _sheets_errors() as e:
+            logger.exception(f"❌ Ошибка подключения: {e}")
+            return
+        
+        # Загружаем статистику заранее, чтобы get_stats не ходил в сеть
+        if self._stats_state is None:
+            try:
+                self._ensure_stats_state()
+            except _sheets_errors() as e:
+                logger.warning(f"⚠️ Не удалось загрузить статистику: {e}")
+        
+        # Дописываем отзывы, оставшиеся в буфере с прошлого запуска
+        with self._lock:
+            try:
+                self._pending_db()
+            except sqlite3.Error as e:
+                logger.error(f"❌ Ошибка открытия локального буфера: {e}")
+                return
+            if self._pending_count:
+                self._schedule_flush(0)
+    
+    def _open(self):
+        """Открытие клиента, таблицы и листа; ошибка пробрасывается вызывающему."""
+        try:
+            import gspread
+            from google.auth.transport.requests import AuthorizedSession
+            from google.oauth2.service_account import Credentials
+            from requests.adapters import HTTPAdapter
+            
             scopes = ["https://www.googleapis.com/auth/spreadsheets"]
             creds = Credentials.from_service_account_file(
                 "credentials.json",
                 scopes=scopes
             )
-            self.client = gspread.authorize(creds)
-            print("✅ Подключено к Google Sheets")
-        except Exception as e:
-            print(f"❌ Ошибка подключения: {e}")
-            self.client = None
+            # Одна AuthorizedSession с увеличенным пулом соединений на весь
+            # процесс: и gspread, и прямые запросы к API идут через нее
+            self._session = AuthorizedSession(creds)
+            self._session.mount("https://", HTTPAdapter(
+                pool_connections=HTTP_POOL_CONNECTIONS,
+                pool_maxsize=HTTP_POOL_MAXSIZE
+            ))
+            self.client = gspread.Client(auth=creds, session=self._session)
+            self._batch_update_url = BATCH_UPDATE_URL.format(id=self.config.SPREADSHEET_ID)
+            self._metadata_search_url = METADATA_SEARCH_URL.format(id=self.config.SPREADSHEET_ID)
+            
+            # Таблица и лист открываются один раз и переиспользуются
+            self._spreadsheet = self.client.open_by_key(self.config.SPREADSHEET_ID)
+            self._worksheet = self._spreadsheet.worksheet(self.config.SHEET_NAME)
+        except Exception:
+            self._reset()
+            raise
+        logger.info("✅ Подключено к Google Sheets")
     
-    def save_feedback(self, user_data: dict, feedback_data: dict):
-        """Сохранение отзыва в таблицу."""
-        if not self.client:
-            self.connect()
-            if not self.client:
-                return False
+    def _reset(self):
+        """Сброс клиента и закэшированных объектов таблицы."""
+        self.client = None
+        self._session = None
+        self._spreadsheet = None
+        self._worksheet = None
+        # Лист мог быть пересоздан — метаданные ищутся заново
+        self._stats_metadata_id = None
+    
+    def _with_sheet(self, action):
+        """Выполнение запроса к листу с одним переподключением при 401/404."""
+        from gspread.exceptions import APIError
         
-        try:
-            spreadsheet = self.client.open_by_key(self.config.SPREADSHEET_ID)
-            sheet = spreadsheet.worksheet(self.config.SHEET_NAME)
-            
-            # Формируем строку для добавления
-            row = [
-                datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                str(user_data.get("id", "")),
-                user_data.get("username", ""),
-                user_data.get("first_name", ""),
-                user_data.get("last_name", ""),
-                str(feedback_data.get("rating", "")),
-                feedback_data.get("type", ""),
-                feedback_data.get("comment", ""),
-                "новый"
-            ]
-            
-            sheet.append_row(row)
-            print(f"✅ Отзыв сохранен для пользователя {user_data.get('id')}")
-            return True
+        for attempt in range(2):
+            if not self._worksheet:
+                # Ошибку подключения получает и логирует вызывающий код
+                self._open()
             
-        except Exception as e:
-            print(f"❌ Ошибка сохранения: {e}")
+            try:
+                return self._retry(action, self._worksheet)
+            except APIError as e:
+                if attempt or e.response.status_code not in (401, 404):
+                    raise
+                # Токен истек или лист пересоздан — открываем заново
+                self._reset()
+    
+    def _retry(self, fn, *args, **kwargs):
+        """Повтор запроса с экспоненциальной задержкой при 429 и 5xx."""
+        from gspread.exceptions import APIError
+        
+        for attempt in range(RETRY_ATTEMPTS):
+            try:
+                return fn(*args, **kwargs)
+            except APIError as e:
+                status = e.response.status_code
+                if attempt == RETRY_ATTEMPTS - 1 or (status != 429 and status < 500):
+                    raise
+                
+                delay = min(RETRY_MAX_DELAY, 2 ** attempt + random.random())
+                logger.warning(f"⏳ Ответ API {status}, повтор через {delay:.1f} сек")
+                time.sleep(delay)
+    
+    def save_feedback(self, user_data: dict, feedback_data: dict):
+        """Постановка отзыва в очередь на запись в таблицу."""
+        return self.save_feedback_batch([(user_data, feedback_data)])[0] is not False
+    
+    def check_feedback(self, user_data: dict, feedback_data: dict):
+        """Проверка отзыва без записи: True — новый, None — дубль, False — кулдаун."""
+        user_id, digest, _ = self._prepare_feedback(user_data, feedback_data)
+        now = time.monotonic()
+        with self._lock:
+            self._prune_recent(now)
+            return self._feedback_status(user_id, digest, now)
+    
+    def _feedback_status(self, user_id, digest, now, batch_digests=(), batch_users=()):
+        """Статус отзыва для check_feedback (вызывается под self._lock)."""
+        # Такой же отзыв уже принят — повторно в таблицу не пишем
+        if digest in self._recent or digest in batch_digests:
+            return None
+        
+        # Повторные нажатия в пределах кулдауна отсекаются до любого запроса к API
+        last = self._last_submit.get(user_id)
+        if user_id in batch_users or (
+                last is not None and now - last < self.config.FEEDBACK_COOLDOWN):
             return False
+        return True
     
-    def get_stats(self):
-        """Получение статистики."""
-        if not self.client:
-            self.connect()
-            if not self.client:
-                return {"total": 0, "average": 0}
+    def save_feedback_batch(self, items):
+        """Постановка пачки отзывов [(user_data, feedback_data), ...] в очередь.
         
-        try:
-            spreadsheet = self.client.open_by_key(self.config.SPREADSHEET_ID)
-            sheet = spreadsheet.worksheet(self.config.SHEET_NAME)
+        Все принятые отзывы сохраняются в локальный буфер одной транзакцией.
+        Возвращает результаты в порядке items: True — поставлен в очередь,
+        None — дубль уже принятого, False — не принят (кулдаун или ошибка буфера).
+        """
+        prepared = [self._prepare_feedback(user_data, feedback_data) for user_data, feedback_data in items]
+        results = [True] * len(prepared)
+        
+        now = time.monotonic()
+        with self._lock:
+            self._prune_recent(now)
             
-            data = sheet.get_all_values()
-            if len(data) <= 1:
-                return {"total": 0, "average": 0}
+            # Проверки и запись — под одной блокировкой: дубль и кулдаун
+            # учитываются только для отзывов, которые реально легли в буфер
+            accepted = []
+            batch_digests = set()
+            batch_users = set()
+            for index, (user_id, digest, row) in enumerate(prepared):
+                status = self._feedback_status(user_id, digest, now, batch_digests, batch_users)
+                if status is None:
+                    logger.info(f"♻️ Дубль отзыва пользователя {user_id} пропущен")
+                    results[index] = None
+                    continue
+                if status is False:
+                    logger.info(f"⏱ Повторный отзыв пользователя {user_id} отклонен")
+                    results[index] = False
+                    continue
+                
+                batch_digests.add(digest)
+                batch_users.add(user_id)
+                accepted.append((user_id, digest, row))
             
-            # Пропускаем заголовок
-            rows = data[1:]
-            ratings = []
+            if not accepted:
+                return results
             
-            for row in rows:
-                if len(row) > 5 and row[5].isdigit():
-                    ratings.append(int(row[5]))
+            # Отзывы сохраняются локально (SQLite WAL) и не теряются при падении;
+            # в таблицу их отправит фоновая запись
+            db = None
+            try:
+                db = self._pending_db()
+                db.execute("BEGIN")
+                db.executemany(
+                    "INSERT INTO pending (payload) VALUES (?)",
+                    [(json.dumps(row, ensure_ascii=False),) for _, _, row in accepted]
+                )
+                db.execute("COMMIT")
+            except sqlite3.Error as e:
+                logger.error(f"❌ Ошибка сохранения в локальный буфер: {e}")
+                if db is not None and db.in_transaction:
+                    db.execute("ROLLBACK")
+                # Ни кулдаун, ни хэш не запоминаются — повторная отправка пройдет
+                return [False if digest in batch_digests else result
+                        for (_, digest, _), result in zip(prepared, results)]
             
-            total = len(rows)
-            average = sum(ratings) / len(ratings) if ratings else 0
+            for user_id, digest, _ in accepted:
+                self._last_submit[user_id] = now
+                self._recent[digest] = now
+            while len(self._recent) > RECENT_FEEDBACK_LIMIT:
+                self._recent.popitem(last=False)
+            self._pending_count += len(accepted)
             
-            return {
-                "total": total,
-                "average": round(average, 2),
-                "last_feedback": rows[-1][0] if rows else "Нет данных"
+            # Полная пачка уходит сразу, но тоже в фоне: вызывающий код
+            # (обработчик в event loop) никогда не ждет ответа от API.
+            # Пока таблица недоступна, повтор идет по своему таймеру
+            if self._pending_count >= self.config.FEEDBACK_BATCH_SIZE and not self._flush_failures:
+                self._schedule_flush(0)
+            else:
+                self._schedule_flush()
+        
+        for user_id, _, _ in accepted:
+            logger.info(f"📥 Отзыв пользователя {user_id} поставлен в очередь")
+        return results
+    
+    @staticmethod
+    def _prepare_feedback(user_data: dict, feedback_data: dict):
+        """(user_id, хэш для отсева дублей, строка для таблицы)."""
+        user_id = user_data.get("id")
+        # None — комментарий не текстом (фото, стикер)
+        comment = feedback_data.get("comment") or ""
+        digest = hashlib.blake2b(
+            f"{user_id}|{feedback_data.get('rating', '')}|{feedback_data.get('type', '')}|"
+            f"{comment.strip().lower()}".encode(),
+            digest_size=8
+        ).digest()
+        
+        # Формируем строку для добавления
+        row = [
+            time.strftime("%Y-%m-%d %H:%M:%S"),
+            str(user_data.get("id", "")),
+            user_data.get("username", ""),
+            user_data.get("first_name", ""),
+            user_data.get("last_name", ""),
+            str(feedback_data.get("rating", "")),
+            feedback_data.get("type", ""),
+            comment,
+            "новый"
+        ]
+        return user_id, digest, row
+    
+    def _prune_recent(self, now):
+        """Удаление хэшей старше DUPLICATE_WINDOW (вызывается под self._lock)."""
+        # Хэши лежат в порядке записи — устаревшие всегда в начале
+        deadline = now - DUPLICATE_WINDOW
+        while self._recent and next(iter(self._recent.values())) < deadline:
+            self._recent.popitem(last=False)
+    
+    def _pending_db(self):
+        """Подключение к локальному буферу (открывается при первом обращении, под self._lock)."""
+        if self._db is None:
+            db = sqlite3.connect(
+                self.config.FEEDBACK_DB,
+                isolation_level=None,
+                check_same_thread=False
+            )
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS pending ("
+                "id INTEGER PRIMARY KEY, payload TEXT NOT NULL)"
+            )
+            self._pending_count = db.execute("SELECT count(*) FROM pending").fetchone()[0]
+            self._db = db
+        return self._db
+    
+    def _schedule_flush(self, delay=None):
+        """Фоновая запись буфера (вызывается под self._lock).
+        
+        Без delay таймер ставится, только если еще не запущен;
+        с явным delay уже запущенный таймер переставляется.
+        """
+        if self._flush_timer is not None:
+            if delay is None:
+                return
+            self._flush_timer.cancel()
+        
+        if delay is None:
+            delay = self.config.FEEDBACK_FLUSH_DELAY
+        
+        self._flush_timer = threading.Timer(delay, self.flush)
+        self._flush_timer.daemon = True
+        self._flush_timer.start()
+    
+    def _prune_last_submit(self):
+        """Удаление истекших кулдаунов (вызывается под self._lock)."""
+        deadline = time.monotonic() - self.config.FEEDBACK_COOLDOWN
+        expired = [uid for uid, ts in self._last_submit.items() if ts < deadline]
+        for uid in expired:
+            del self._last_submit[uid]
+    
+    def flush(self):
+        """Запись накопленных отзывов в таблицу пачками по FLUSH_MAX_ROWS строк."""
+        # Пачки пишутся строго по очереди, чтобы не перепутать порядок строк
+        with self._flush_lock:
+            with self._lock:
+                if self._flush_timer is not None:
+                    self._flush_timer.cancel()
+                    self._flush_timer = None
+                self._prune_last_submit()
+            
+            while True:
+                with self._lock:
+                    if self._sent_ids:
+                        self._delete_pending(())
+                    try:
+                        batch = self._pending_db().execute(
+                            "SELECT id, payload FROM pending ORDER BY id LIMIT ?",
+                            (FLUSH_MAX_ROWS + len(self._sent_ids),)
+                        ).fetchall()
+                    except sqlite3.Error as e:
+                        logger.error(f"❌ Ошибка чтения локального буфера: {e}")
+                        return False
+                    batch = [
+                        (item_id, payload) for item_id, payload in batch
+                        if item_id not in self._sent_ids
+                    ][:FLUSH_MAX_ROWS]
+                
+                if not batch:
+                    if self._flush_failures:
+                        logger.info("✅ Запись в таблицу восстановлена")
+                        self._flush_failures = 0
+                    return True
+                
+                try:
+                    rows = [json.loads(payload) for _, payload in batch]
+                    # Статистика должна быть известна до записи, иначе новые
+                    # строки не попадут в счетчики
+                    state = self._stats_after(self._ensure_stats_state(), rows)
+                    
+                    self._with_sheet(lambda sheet: self._append_rows(sheet, rows, state))
+                    logger.info(f"✅ Сохранено отзывов: {len(rows)}")
+                    
+                except _sheets_errors() as e:
+                    # Строки остаются в локальном буфере — пробуем позже
+                    delay = self._flush_retry_delay()
+                    # Трейсбек — один раз на сбой, дальше короткие предупреждения
+                    if self._flush_failures == 1:
+                        logger.exception(f"❌ Ошибка сохранения, повтор через {delay} сек: {e}")
+                    else:
+                        logger.warning(f"⚠️ Таблица все еще недоступна, повтор через {delay} сек: {e}")
+                    with self._lock:
+                        self._schedule_flush(delay)
+                    return False
+                except Exception as e:
+                    # Таймер уже снят — без повтора буфер больше не запишется
+                    delay = self._flush_retry_delay()
+                    logger.exception(f"❌ Непредвиденная ошибка записи, повтор через {delay} сек: {e}")
+                    with self._lock:
+                        self._schedule_flush(delay)
+                    return False
+                
+                # Строки и статистика уже в таблице
+                self._stats_state = state
+                with self._lock:
+                    self._pending_count -= len(batch)
+                    self._delete_pending(item_id for item_id, _ in batch)
+    
+    def _flush_retry_delay(self):
+        """Пауза до повтора записи: с каждой неудачей подряд вдвое дольше."""
+        self._flush_failures += 1
+        return min(
+            FLUSH_RETRY_MAX_DELAY,
+            FLUSH_RETRY_DELAY * 2 ** (self._flush_failures - 1)
+        )
+    
+    def _delete_pending(self, ids):
+        """Удаление записанных строк из буфера (вызывается под self._lock).
+        
+        При ошибке SQLite id запоминаются: строки не отправятся повторно,
+        а удалить их попробуем при следующей записи.
+        """
+        self._sent_ids.update(ids)
+        try:
+            self._pending_db().executemany(
+                "DELETE FROM pending WHERE id = ?",
+                [(item_id,) for item_id in self._sent_ids]
+            )
+        except sqlite3.Error as e:
+            logger.error(f"❌ Ошибка очистки локального буфера: {e}")
+            return
+        self._sent_ids.clear()
+    
+    def _append_rows(self, sheet, rows, state):
+        """Добавление строк и обновление статистики одним POST spreadsheets.batchUpdate."""
+        if self._stats_metadata_id is None:
+            self._find_stats_metadata(sheet)
+        
+        return self._post_batch_update([
+            # appendCells дописывает строки после последней заполненной,
+            # значения хранятся как есть (аналог valueInputOption=RAW)
+            {"appendCells": {
+                "sheetId": sheet.id,
+                "rows": [
+                    {"values": [{"userEnteredValue": {"stringValue": str(value)}} for value in row]}
+                    for row in rows
+                ],
+                "fields": "userEnteredValue"
+            }},
+            self._stats_metadata_request(sheet, state)
+        ])
+    
+    def _post(self, url, body):
+        """POST к Sheets API через общую сессию."""
+        from gspread.exceptions import APIError
+        
+        response = self._session.post(url, json=body)
+        if not response.ok:
+            raise APIError(response)
+        return response.json()
+    
+    def _post_batch_update(self, requests):
+        """spreadsheets.batchUpdate; запоминает metadataId, если метаданные созданы."""
+        response = self._post(self._batch_update_url, {"requests": requests})
+        for reply in response.get("replies", []):
+            created = reply.get("createDeveloperMetadata")
+            if created:
+                self._stats_metadata_id = created["developerMetadata"]["metadataId"]
+        return response
+    
+    def _find_stats_metadata(self, sheet):
+        """Поиск метаданных со статистикой листа; None, если их еще нет."""
+        found = self._post(self._metadata_search_url, {"dataFilters": [{
+            "developerMetadataLookup": {
+                "metadataKey": STATS_METADATA_KEY,
+                "metadataLocation": {"sheetId": sheet.id}
             }
+        }]})
+        for match in found.get("matchedDeveloperMetadata", []):
+            metadata = match["developerMetadata"]
+            self._stats_metadata_id = metadata["metadataId"]
+            return metadata
+        return None
+    
+    def _stats_metadata_request(self, sheet, state):
+        """Запрос batchUpdate, сохраняющий статистику в метаданные листа."""
+        value = json.dumps(state)
+        if self._stats_metadata_id is None:
+            return {"createDeveloperMetadata": {"developerMetadata": {
+                "metadataKey": STATS_METADATA_KEY,
+                "metadataValue": value,
+                "location": {"sheetId": sheet.id},
+                "visibility": "DOCUMENT"
+            }}}
+        return {"updateDeveloperMetadata": {
+            "dataFilters": [{"developerMetadataLookup": {"metadataId": self._stats_metadata_id}}],
+            "developerMetadata": {"metadataValue": value},
+            "fields": "metadataValue"
+        }}
+    
+    def _ensure_stats_state(self):
+        """Загрузка статистики из метаданных листа (один раз)."""
+        if self._stats_state is None:
+            with self._stats_lock:
+                # Пока ждали блокировку, статистику мог загрузить другой поток
+                if self._stats_state is None:
+                    self._stats_state = self._with_sheet(self._load_stats_state)
+        return self._stats_state
+    
+    def _load_stats_state(self, sheet):
+        """Чтение статистики из метаданных, при отсутствии — перенос из старой ячейки или пересчет."""
+        metadata = self._find_stats_metadata(sheet)
+        state = self._parse_stats(metadata.get("metadataValue")) if metadata else None
+        if state is not None:
+            return state
+        
+        requests = []
+        legacy = None
+        if metadata is None:
+            # Статистика из прежней служебной ячейки переносится, а ячейка очищается
+            legacy = self._parse_stats(sheet.acell(LEGACY_STATS_CELL).value)
+        if legacy is not None:
+            from gspread.utils import a1_to_rowcol
             
-        except Exception as e:
-            print(f"❌ Ошибка получения статистики: {e}")
-            return {"total": 0, "average": 0}
+            legacy_row, legacy_col = a1_to_rowcol(LEGACY_STATS_CELL)
+            requests.append({"updateCells": {
+                "start": {
+                    "sheetId": sheet.id,
+                    "rowIndex": legacy_row - 1,
+                    "columnIndex": legacy_col - 1
+                },
+                "rows": [{"values": [{}]}],
+                "fields": "userEnteredValue"
+            }})
+            state = legacy
+        else:
+            state = self._rebuild_stats_state(sheet)
+        
+        requests.append(self._stats_metadata_request(sheet, state))
+        self._post_batch_update(requests)
+        return state
+    
+    @staticmethod
+    def _parse_stats(raw):
+        """Статистика из JSON; None, если значение пустое или чужое."""
+        try:
+            state = json.loads(raw) if raw else None
+        except ValueError:
+            return None
+        if isinstance(state, dict) and {"total", "sum", "count", "last"} <= state.keys():
+            return state
+        return None
+    
+    def _rebuild_stats_state(self, sheet):
+        """Полный пересчет статистики по всем строкам листа."""
+        # Нужны только дата (A) и оценка (F): два диапазона одним запросом,
+        # без заголовка и без колонок с комментариями
+        ts_col, rating_col = sheet.batch_get(["A2:A", "F2:F"])
+        
+        state = {
+            "total": len(ts_col),
+            "sum": 0,
+            "count": 0,
+            "last": ts_col[-1][0] if ts_col else ""
+        }
+        
+        # Различных оценок всего пять: значения колонки считает Counter
+        # (цикл на C), а разбираются только уникальные строки
+        counts = Counter(map(itemgetter(0), filter(None, rating_col)))
+        for value, n in counts.items():
+            try:
+                state["sum"] += int(value) * n
+            except ValueError:
+                continue
+            state["count"] += n
+        return state
+    
+    def _stats_after(self, state, rows):
+        """Накопленная статистика с учетом новых строк (новый словарь)."""
+        state = dict(state)
+        for row in rows:
+            # Пустая оценка ("") отсеивается тем же int(), без isdigit()
+            try:
+                state["sum"] += int(row[5])
+            except (IndexError, ValueError):
+                continue
+            state["count"] += 1
+        
+        if rows:
+            state["total"] += len(rows)
+            state["last"] = rows[-1][0]
+        return state
+    
+    def get_stats(self):
+        """Получение статистики."""
+        empty = {"total": 0, "average": 0, "last_feedback": "Нет данных"}
+        
+        # Пока таблица недоступна, нажатия на «Статистику» не ходят в API
+        # на каждый клик: повтор не чаще раза в STATS_RETRY_DELAY сек
+        if (self._stats_state is None and self._stats_failed_at is not None
+                and time.monotonic() - self._stats_failed_at < STATS_RETRY_DELAY):
+            return empty
+        
+        try:
+            state = self._ensure_stats_state()
+        except _sheets_errors() as e:
+            logger.exception(f"❌ Ошибка получения статистики: {e}")
+            self._stats_failed_at = time.monotonic()
+            return empty
+        
+        average = state["sum"] / state["count"] if state["count"] else 0
+        
+        return {
+            "total": state["total"],
+            "average": round(average, 2),
+            "last_feedback": state["last"] or "Нет данных"
+        }
 
 
 # Глобальный экземпляр
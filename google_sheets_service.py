@@ -3,10 +3,27 @@
 Подробные комментарии для понимания каждой строки кода
 """
 
+from collections import Counter
+from contextlib import contextmanager
 import gspread
+from gspread.utils import (
+    a1_range_to_grid_range, a1_to_rowcol, absolute_range_name, rowcol_to_a1
+)
+from google.auth.transport.requests import AuthorizedSession
 from google.oauth2.service_account import Credentials
-from datetime import datetime
+from googleapiclient.discovery import build
+from googleapiclient.errors import HttpError
+from requests.adapters import HTTPAdapter
+from datetime import date, datetime, timedelta
+import functools
+import hashlib
 import logging
+import os
+import queue
+import random
+import sqlite3
+import threading
+import time
 from typing import Dict, Any, List, Optional
 import json
 
@@ -14,6 +31,164 @@ import json
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Пул HTTP-соединений общей AuthorizedSession
+HTTP_POOL_CONNECTIONS = 4
+HTTP_POOL_MAXSIZE = 16
+
+# Квоты Sheets API на пользователя: запросов в минуту
+WRITE_REQUESTS_PER_MINUTE = 60
+READ_REQUESTS_PER_MINUTE = 300
+
+# Повторы при 429/5xx: задержка 2, 4, 8... сек, но не больше RETRY_MAX_DELAY
+RETRY_ATTEMPTS = 6
+RETRY_MAX_DELAY = 60
+
+# Фоновая запись: до QUEUE_BATCH_SIZE строк одним запросом, ожидание
+# следующих строк не дольше QUEUE_FLUSH_DELAY сек
+QUEUE_BATCH_SIZE = 50
+QUEUE_FLUSH_DELAY = 2
+# Повтор незаписанной пачки: 30, 60, 120... сек, но не больше QUEUE_RETRY_MAX_DELAY
+QUEUE_RETRY_DELAY = 30
+QUEUE_RETRY_MAX_DELAY = 600
+
+
+# Колонки листа отзывов (A-N)
+HEADERS = [
+    "Timestamp",          # Дата и время
+    "User ID",           # ID пользователя Telegram
+    "Username",          # @username
+    "First Name",        # Имя
+    "Last Name",         # Фамилия
+    "Rating",            # Оценка 1-5
+    "Type",              # Тип фидбека
+    "Comment",           # Комментарий
+    "Status",            # Статус (новый/обработан)
+    "Language Code",     # Язык пользователя
+    "Chat ID",           # ID чата
+    "Platform",          # Платформа (Telegram)
+    "Bot Version",       # Версия бота
+    "Session ID",        # ID сессии
+]
+
+# Ширина колонок листа отзывов в пикселях: (индекс колонки, ширина)
+_COLUMN_WIDTHS = [
+    (0, 150),   # A: Timestamp
+    (1, 100),   # B: User ID
+    (2, 120),   # C: Username
+    (3, 100),   # D: First Name
+    (4, 100),   # E: Last Name
+    (5, 80),    # F: Rating
+    (6, 100),   # G: Type
+    (7, 300),   # H: Comment
+    (8, 100),   # I: Status
+    (9, 100),   # J: Language Code
+    (10, 100),  # K: Chat ID
+    (11, 100),  # L: Platform
+    (12, 100),  # M: Bot Version
+    (13, 120),  # N: Session ID
+]
+
+# Необходимые разрешения. Чем меньше scope, тем безопаснее:
+# для бота достаточно только sheets
+_SCOPES = (
+    "https://www.googleapis.com/auth/spreadsheets",
+    # "https://www.googleapis.com/auth/drive"  # Нужен только если создаем таблицы
+)
+
+# Колонки, из которых считается статистика (аргументы _update_aggregates)
+STATS_COLUMNS = ("Timestamp", "Rating", "Type", "Comment", "Status")
+_ROW_STATS_POSITIONS = [HEADERS.index(column) for column in STATS_COLUMNS]
+
+# Начало отсчета серийных дат Google Sheets (SERIAL_NUMBER)
+SHEETS_EPOCH = datetime(1899, 12, 30)
+
+
+def _spreadsheet_from_metadata(client: gspread.Client, metadata: Dict) -> gspread.Spreadsheet:
+    """
+    Объект gspread.Spreadsheet из уже полученных метаданных.
+    
+    Конструктор Spreadsheet всегда заново запрашивает метаданные,
+    поэтому объект собирается без него.
+    """
+    spreadsheet = gspread.Spreadsheet.__new__(gspread.Spreadsheet)
+    spreadsheet.client = client
+    spreadsheet._properties = {"id": metadata["spreadsheetId"], **metadata["properties"]}
+    return spreadsheet
+
+
+class _RateLimiter:
+    """
+    Token bucket: не больше rate запросов за per секунд.
+    
+    Запросы сверх лимита не отбрасываются, а ждут своей очереди,
+    поэтому всплеск отзывов не упирается в 429 от Google.
+    """
+    
+    def __init__(self, rate: int, per: float):
+        self.capacity = rate
+        self.fill_rate = rate / per
+        self.tokens = float(rate)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+    
+    def acquire(self):
+        """Забрать один токен, при необходимости подождав."""
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity,
+                              self.tokens + (now - self.updated) * self.fill_rate)
+            self.updated = now
+            # Токен резервируется сразу, даже в долг — так ожидающие
+            # потоки выстраиваются в очередь, а не соревнуются
+            self.tokens -= 1
+            wait = -self.tokens / self.fill_rate if self.tokens < 0 else 0
+        
+        if wait:
+            time.sleep(wait)
+
+
+@functools.lru_cache(maxsize=4)
+def _load_credentials(path: str, mtime: float, scopes: tuple) -> Credentials:
+    """
+    Чтение ключа сервисного аккаунта с кэшированием на весь процесс.
+    
+    mtime входит в ключ кэша, поэтому измененный файл перечитывается.
+    """
+    return Credentials.from_service_account_file(path, scopes=list(scopes))
+
+
+# Клиенты на весь процесс: (путь, mtime, scopes) ->
+# (gspread.Client, клиент Sheets v4, блокировка клиента Sheets v4).
+# Повторный connect() и новые экземпляры сервиса используют уже открытые
+# keep-alive соединения вместо нового TCP/TLS-рукопожатия
+_CLIENTS: Dict[tuple, tuple] = {}
+_CLIENTS_LOCK = threading.Lock()
+
+
+def _shared_clients(key: tuple, creds: Credentials) -> tuple:
+    """
+    Общие клиенты для учетных данных: gspread поверх AuthorizedSession
+    с пулом соединений и клиент Sheets v4 (google-api-python-client).
+    
+    Клиент Sheets v4 строится один раз: его транспорт httplib2 держит
+    keep-alive соединение, но не потокобезопасен — запросы через него
+    выполняются под возвращаемой блокировкой (см. _execute).
+    """
+    with _CLIENTS_LOCK:
+        clients = _CLIENTS.get(key)
+        if clients is None:
+            session = AuthorizedSession(creds)
+            session.mount("https://", HTTPAdapter(
+                pool_connections=HTTP_POOL_CONNECTIONS,
+                pool_maxsize=HTTP_POOL_MAXSIZE
+            ))
+            clients = _CLIENTS[key] = (
+                gspread.Client(auth=creds, session=session),
+                build("sheets", "v4", credentials=creds, cache_discovery=False),
+                threading.Lock()
+            )
+        return clients
+
 
 class GoogleSheetsService:
     """
@@ -27,6 +202,25 @@ class GoogleSheetsService:
     5. Очистка старых записей
     """
     
+    # Общие экземпляры сервиса: (credentials_file, spreadsheet_id) -> сервис
+    _instances: Dict[tuple, "GoogleSheetsService"] = {}
+    _instances_lock = threading.Lock()
+    
+    @classmethod
+    def instance(cls, credentials_file: str = "credentials.json",
+                 spreadsheet_id: str = None) -> "GoogleSheetsService":
+        """
+        Один экземпляр сервиса на таблицу для всего процесса.
+        
+        Клиент, соединения, очередь записи и статистика не дублируются.
+        """
+        key = (os.path.abspath(credentials_file), spreadsheet_id)
+        with cls._instances_lock:
+            service = cls._instances.get(key)
+            if service is None:
+                service = cls._instances[key] = cls(credentials_file, spreadsheet_id)
+            return service
+    
     def __init__(self, credentials_file: str = "credentials.json", 
                  spreadsheet_id: str = None):
         """
@@ -42,22 +236,89 @@ class GoogleSheetsService:
         self.spreadsheet = None
         self.sheet = None
         
-        # Кэширование для уменьшения запросов к API
-        self._stats_cache = None
-        self._cache_time = None
+        # Заголовок -> индекс колонки (уточняется по листу при подключении)
+        self._header_index = {header: i for i, header in enumerate(HEADERS)}
+        
+        # Клиент Sheets v4 (google-api-python-client) для фоновой записи
+        self._svc = None
+        self._svc_lock = None
+        
+        # Ограничение частоты запросов к API
+        self._write_bucket = _RateLimiter(WRITE_REQUESTS_PER_MINUTE, 60)
+        self._read_bucket = _RateLimiter(READ_REQUESTS_PER_MINUTE, 60)
+        
+        # Очередь отзывов на запись. Каждый отзыв сначала сохраняется в
+        # SQLite рядом с credentials.json и не теряется при падении бота
+        self._queue_file = os.path.join(
+            os.path.dirname(credentials_file), "feedback_queue.db"
+        )
+        self._queue = queue.Queue()
+        self._queue_db = None
+        self._queue_lock = threading.Lock()
+        self._worker = None
+        # id строк, уже записанных в таблицу, но не удаленных из SQLite
+        self._written_ids = set()
+        
+        # Запросы, накопленные внутри with self.batched(): ...
+        self._pending_requests: Optional[List[Dict]] = None
+        
+        # Агрегаты статистики обновляются при каждом сохранении и лежат
+        # в JSON рядом с credentials.json — get_statistics не ходит в API
+        self._agg_file = os.path.join(
+            os.path.dirname(credentials_file), "feedback_stats.json"
+        )
+        self._agg = None
+        self._agg_lock = threading.Lock()
+        
+        # Сверка агрегатов с таблицей (правки вручную, смена статусов):
+        # свежие CACHE_TIMEOUT секунд, затем еще CACHE_GRACE секунд отдаем
+        # устаревшие и пересчитываем в фоне, после — пересчет синхронно
         self.CACHE_TIMEOUT = 60  # секунд
+        self.CACHE_GRACE = 600  # секунд
+        self._agg_synced_at = None  # time.monotonic() последней сверки
+        self._refreshing = False
+        self._refresh_backlog = []  # строки, сохраненные во время сверки
         
-    def _get_scopes(self) -> List[str]:
+    def _call(self, bucket: _RateLimiter, fn, *args, **kwargs):
         """
-        Определяем необходимые разрешения (scopes).
-        
-        Важно: чем меньше scope, тем безопаснее.
-        Для нашего бота достаточно только sheets.
+        Вызов Sheets API через лимитер с повтором при 429 и 5xx.
         """
-        return [
-            "https://www.googleapis.com/auth/spreadsheets",
-            # "https://www.googleapis.com/auth/drive"  # Нужен только если создаем таблицы
-        ]
+        for attempt in range(RETRY_ATTEMPTS):
+            bucket.acquire()
+            try:
+                return fn(*args, **kwargs)
+            except (gspread.exceptions.APIError, HttpError) as e:
+                # gspread и клиент Sheets v4 хранят статус ответа по-разному
+                if isinstance(e, HttpError):
+                    status = int(e.resp.status)
+                else:
+                    status = e.response.status_code
+                if attempt == RETRY_ATTEMPTS - 1 or (status != 429 and status < 500):
+                    raise
+                
+                delay = min(RETRY_MAX_DELAY, 2 ** (attempt + 1))
+                logger.warning(f"⏳ Ответ API {status}, повтор через {delay} сек")
+                time.sleep(delay)
+    
+    def _read(self, fn, *args, **kwargs):
+        """Запрос на чтение (квота чтений)."""
+        return self._call(self._read_bucket, fn, *args, **kwargs)
+    
+    def _write(self, fn, *args, **kwargs):
+        """Запрос на запись (квота записей)."""
+        return self._call(self._write_bucket, fn, *args, **kwargs)
+    
+    def _execute(self, request, **kwargs):
+        """Выполнение запроса Sheets v4 под блокировкой общего клиента."""
+        with self._svc_lock:
+            return request.execute(**kwargs)
+    
+    @staticmethod
+    def _get_scopes() -> tuple:
+        """
+        Необходимые разрешения (scopes), см. _SCOPES.
+        """
+        return _SCOPES
     
     def _create_credentials(self):
         """
@@ -67,16 +328,13 @@ class GoogleSheetsService:
         или указан полный путь.
         """
         try:
-            # Читаем файл с учетными данными
-            with open(self.credentials_file, 'r') as f:
-                creds_data = json.load(f)
-                logger.info(f"✅ Учетные данные загружены. Email: {creds_data.get('client_email')}")
-            
-            # Создаем объект Credentials
-            creds = Credentials.from_service_account_file(
+            # Файл читается и разбирается один раз, пока не изменится
+            creds = _load_credentials(
                 self.credentials_file,
-                scopes=self._get_scopes()
+                os.path.getmtime(self.credentials_file),
+                self._get_scopes()
             )
+            logger.info(f"✅ Учетные данные загружены. Email: {creds.service_account_email}")
             return creds
             
         except FileNotFoundError:
@@ -103,27 +361,63 @@ class GoogleSheetsService:
             # Получаем учетные данные
             creds = self._create_credentials()
             
-            # Авторизуем клиент gspread
-            self.client = gspread.authorize(creds)
+            # Авторизуем клиенты (одни на процесс для этих учетных данных).
+            # Для горячего пути (фоновая запись отзывов) запросы собираются
+            # вручную и идут через переиспользуемый клиент Sheets v4
+            self.client, self._svc, self._svc_lock = _shared_clients(
+                (self.credentials_file,
+                 os.path.getmtime(self.credentials_file),
+                 self._get_scopes()),
+                creds
+            )
             
             # Открываем таблицу по ID
             if self.spreadsheet_id:
-                self.spreadsheet = self.client.open_by_key(self.spreadsheet_id)
-                self.sheet = self.spreadsheet.sheet1  # Первый лист
+                # Название таблицы, свойства листов и первая строка
+                # первого листа — один запрос вместо open_by_key,
+                # get_worksheet и row_values
+                metadata = self._read(self._execute, self._svc.spreadsheets().get(
+                    spreadsheetId=self.spreadsheet_id,
+                    ranges=["A1:N1"],
+                    includeGridData=True,
+                    fields="spreadsheetId,properties.title,sheets.properties,"
+                           "sheets.data.rowData.values.formattedValue"
+                ), num_retries=3)
+                
+                self.spreadsheet = _spreadsheet_from_metadata(self.client, metadata)
+                # Диапазон без имени листа относится к первому видимому
+                # листу; данные API возвращает только для него
+                first_sheet = next(
+                    (sheet for sheet in metadata["sheets"] if sheet.get("data")),
+                    metadata["sheets"][0]
+                )
+                self.sheet = gspread.Worksheet(self.spreadsheet, first_sheet["properties"])
                 
                 # Проверяем доступ
                 title = self.spreadsheet.title
                 logger.info(f"✅ Подключено успешно! Таблица: '{title}'")
                 
                 # Инициализируем заголовки, если таблица пустая
-                self._initialize_headers()
+                row_data = (first_sheet.get("data") or [{}])[0].get("rowData") or [{}]
+                first_row = [
+                    cell.get("formattedValue", "")
+                    for cell in row_data[0].get("values", [])
+                ]
+                self._initialize_headers(first_row if any(first_row) else [])
+                
+                # Отзывы, оставшиеся в локальной очереди с прошлого запуска,
+                # дописываются сразу, а не с первым новым отзывом
+                try:
+                    self._start_worker()
+                except sqlite3.Error as e:
+                    logger.error(f"❌ Ошибка открытия локальной очереди: {e}")
                 
                 return True
             else:
                 logger.warning("⚠️ Не указан spreadsheet_id")
                 return False
                 
-        except gspread.exceptions.APIError as e:
+        except (gspread.exceptions.APIError, HttpError) as e:
             logger.error(f"❌ Ошибка API Google Sheets: {e}")
             logger.info("💡 Проверьте:")
             logger.info("1. Включен ли Google Sheets API в консоли")
@@ -134,45 +428,35 @@ class GoogleSheetsService:
             logger.error(f"❌ Ошибка подключения: {e}")
             return False
     
-    def _initialize_headers(self):
+    def _initialize_headers(self, first_row: List[str]):
         """
         Инициализация заголовков таблицы, если она пустая.
         Создает структуру для хранения отзывов.
+        
+        Args:
+            first_row: Значения первой строки (уже прочитаны в connect)
         """
         try:
-            # Получаем все значения из первого ряда
-            first_row = self.sheet.row_values(1)
-            
             # Если первая строка пустая, создаем заголовки
             if not first_row:
-                headers = [
-                    "Timestamp",          # Дата и время
-                    "User ID",           # ID пользователя Telegram
-                    "Username",          # @username
-                    "First Name",        # Имя
-                    "Last Name",         # Фамилия
-                    "Rating",            # Оценка 1-5
-                    "Type",              # Тип фидбека
-                    "Comment",           # Комментарий
-                    "Status",            # Статус (новый/обработан)
-                    "Language Code",     # Язык пользователя
-                    "Chat ID",           # ID чата
-                    "Platform",          # Платформа (Telegram)
-                    "Bot Version",       # Версия бота
-                    "Session ID",        # ID сессии
-                ]
                 
-                self.sheet.insert_row(headers, 1)
-                logger.info("✅ Созданы заголовки таблицы")
-                
-                # Форматируем заголовки (жирный шрифт)
-                self.sheet.format('A1:N1', {
-                    'textFormat': {'bold': True},
-                    'backgroundColor': {'red': 0.9, 'green': 0.9, 'blue': 1.0}
-                })
+                # Заголовки, их формат и ширина колонок — один запрос
+                with self.batched():
+                    self._queue_update(self.sheet, 'A1', [HEADERS])
+                    
+                    # Форматируем заголовки (жирный шрифт)
+                    self._queue_format(self.sheet, 'A1:N1', {
+                        'textFormat': {'bold': True},
+                        'backgroundColor': {'red': 0.9, 'green': 0.9, 'blue': 1.0}
+                    })
+                    
+                    # Настраиваем ширину колонок
+                    self._adjust_column_widths()
                 
-                # Настраиваем ширину колонок
-                self._adjust_column_widths()
+                logger.info("✅ Созданы заголовки таблицы")
+            else:
+                # Колонки ищем по заголовкам листа, а не по позициям
+                self._header_index = {header: i for i, header in enumerate(first_row)}
                 
         except Exception as e:
             logger.error(f"❌ Ошибка инициализации заголовков: {e}")
@@ -182,35 +466,17 @@ class GoogleSheetsService:
         Автоматическая настройка ширины колонок для лучшего отображения.
         """
         try:
-            # Задаем оптимальную ширину для каждой колонки
-            column_widths = {
-                'A': 150,  # Timestamp
-                'B': 100,  # User ID
-                'C': 120,  # Username
-                'D': 100,  # First Name
-                'E': 100,  # Last Name
-                'F': 80,   # Rating
-                'G': 100,  # Type
-                'H': 300,  # Comment
-                'I': 100,  # Status
-                'J': 100,  # Language Code
-                'K': 100,  # Chat ID
-                'L': 100,  # Platform
-                'M': 100,  # Bot Version
-                'N': 120,  # Session ID
-            }
-            
-            # Применяем ширину (через gspread нет прямой поддержки,
-            # но можно через batch_update)
+            # Применяем ширину из _COLUMN_WIDTHS (через gspread нет прямой
+            # поддержки, но можно через batch_update)
             requests = []
-            for col, width in column_widths.items():
+            for index, width in _COLUMN_WIDTHS:
                 requests.append({
                     "updateDimensionProperties": {
                         "range": {
                             "sheetId": self.sheet.id,
                             "dimension": "COLUMNS",
-                            "startIndex": ord(col) - ord('A'),
-                            "endIndex": ord(col) - ord('A') + 1
+                            "startIndex": index,
+                            "endIndex": index + 1
                         },
                         "properties": {
                             "pixelSize": width
@@ -219,8 +485,7 @@ class GoogleSheetsService:
                     }
                 })
             
-            if requests:
-                self.spreadsheet.batch_update({"requests": requests})
+            self._submit_requests(requests)
                 
         except Exception as e:
             logger.warning(f"⚠️ Не удалось настроить ширину колонок: {e}")
@@ -230,6 +495,9 @@ class GoogleSheetsService:
         """
         Сохранение отзыва в таблицу.
         
+        Отзыв записывается в локальную очередь (SQLite) и сразу
+        возвращается успех; в таблицу его пачкой отправит фоновый поток.
+        
         Args:
             user_data: Данные пользователя Telegram
             feedback_data: Данные отзыва
@@ -245,134 +513,461 @@ class GoogleSheetsService:
         }
         
         try:
-            # Проверяем подключение
-            if not self.client or not self.sheet:
-                if not self.connect():
-                    result["error"] = "Не удалось подключиться к Google Sheets"
-                    return result
-            
             # Готовим данные для сохранения
-            timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            # Тот же формат "%Y-%m-%d %H:%M:%S", но без разбора шаблона strftime
+            timestamp = datetime.now().isoformat(sep=" ", timespec="seconds")
             result["timestamp"] = timestamp
             
+            # ID и оценка уходят числами (RAW -> numberValue): таблица
+            # сортирует и считает их как числа
             row_data = [
-                timestamp,                                 # A: Дата и время
-                str(user_data.get("id", "")),             # B: User ID
-                user_data.get("username", ""),            # C: Username
-                user_data.get("first_name", ""),          # D: Имя
-                user_data.get("last_name", ""),           # E: Фамилия
-                str(feedback_data.get("rating", "")),     # F: Оценка
-                feedback_data.get("type", ""),            # G: Тип фидбека
-                feedback_data.get("comment", ""),         # H: Комментарий
-                "🆕 Новый",                               # I: Статус
-                user_data.get("language_code", "ru"),     # J: Язык
-                str(user_data.get("chat_id", "")),        # K: Chat ID
-                "Telegram",                               # L: Платформа
-                "1.0",                                    # M: Версия бота
-                feedback_data.get("session_id", ""),      # N: ID сессии
+                timestamp,                                          # A: Дата и время
+                self._as_number(user_data.get("id", "")),           # B: User ID
+                user_data.get("username", ""),                      # C: Username
+                user_data.get("first_name", ""),                    # D: Имя
+                user_data.get("last_name", ""),                     # E: Фамилия
+                self._as_number(feedback_data.get("rating", "")),   # F: Оценка
+                feedback_data.get("type", ""),                      # G: Тип фидбека
+                feedback_data.get("comment", ""),                   # H: Комментарий
+                "🆕 Новый",                                         # I: Статус
+                user_data.get("language_code", "ru"),               # J: Язык
+                self._as_number(user_data.get("chat_id", "")),      # K: Chat ID
+                "Telegram",                                         # L: Платформа
+                "1.0",                                              # M: Версия бота
+                feedback_data.get("session_id", ""),                # N: ID сессии
             ]
             
-            # Добавляем строку в таблицу
-            self.sheet.append_row(row_data)
-            
-            # Получаем номер добавленной строки
-            all_values = self.sheet.get_all_values()
-            row_number = len(all_values)
-            
-            # Форматируем новую строку
-            self._format_new_row(row_number)
-            
-            # Сбрасываем кэш статистики
-            self._stats_cache = None
+            # В таблицу строку запишет фоновый поток — обработчик бота
+            # не ждет ответа от Google
+            self._enqueue({
+                "row": row_data,
+                "user": user_data,
+                "feedback": feedback_data
+            })
             
             result.update({
                 "success": True,
-                "row_number": row_number,
-                "message": f"Отзыв сохранен в строке {row_number}"
+                "message": "Отзыв принят и будет сохранен в таблицу"
             })
             
-            logger.info(f"✅ Отзыв #{row_number} сохранен для пользователя {user_data.get('id')}")
-            
-            # Отправляем вебхук-уведомление (опционально)
-            self._send_webhook_notification(row_number, user_data, feedback_data)
+            logger.info(f"📥 Отзыв пользователя {user_data.get('id')} поставлен в очередь")
             
             return result
             
-        except Exception as e:
+        except (sqlite3.Error, OSError) as e:
             error_msg = f"Ошибка сохранения: {str(e)}"
             logger.error(f"❌ {error_msg}")
             result["error"] = error_msg
             return result
     
-    def _format_new_row(self, row_number: int):
+    @staticmethod
+    def _as_number(value: Any) -> Any:
+        """Целое число как int, остальные значения как есть."""
+        try:
+            return int(value)
+        except (TypeError, ValueError):
+            return value
+    
+    def _start_worker(self):
         """
-        Форматирование новой строки для лучшей читаемости.
+        Открытие локальной очереди и запуск фонового потока (один раз).
         
-        Args:
-            row_number: Номер строки для форматирования
+        Отзывы, оставшиеся в SQLite с прошлого запуска, снова ставятся в очередь.
         """
-        try:
-            # Форматируем оценку (цвет в зависимости от значения)
-            rating_cell = f"F{row_number}"
-            rating_value = self.sheet.acell(rating_cell).value
-            
-            if rating_value:
-                rating = int(rating_value)
-                # Цвета от красного (1) до зеленого (5)
-                colors = {
-                    1: {"red": 1.0, "green": 0.8, "blue": 0.8},
-                    2: {"red": 1.0, "green": 0.9, "blue": 0.7},
-                    3: {"red": 1.0, "green": 1.0, "blue": 0.7},
-                    4: {"red": 0.8, "green": 1.0, "blue": 0.8},
-                    5: {"red": 0.7, "green": 1.0, "blue": 0.7},
-                }
-                
-                if rating in colors:
-                    self.sheet.format(rating_cell, {
-                        "backgroundColor": colors[rating],
-                        "horizontalAlignment": "CENTER",
-                        "textFormat": {"bold": True, "fontSize": 11}
-                    })
+        with self._queue_lock:
+            if self._worker is not None:
+                return
             
-            # Форматируем ячейку статуса
-            status_cell = f"I{row_number}"
-            self.sheet.format(status_cell, {
-                "backgroundColor": {"red": 0.9, "green": 0.95, "blue": 1.0},
-                "horizontalAlignment": "CENTER",
-                "textFormat": {"bold": True}
-            })
+            db = sqlite3.connect(self._queue_file, isolation_level=None,
+                                 check_same_thread=False)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS pending ("
+                "id INTEGER PRIMARY KEY, payload TEXT NOT NULL)"
+            )
+            for item_id, payload in db.execute("SELECT id, payload FROM pending ORDER BY id"):
+                self._queue.put((item_id, json.loads(payload)))
+            self._queue_db = db
             
-            # Форматируем ячейку типа фидбека
-            type_cell = f"G{row_number}"
-            type_value = self.sheet.acell(type_cell).value
-            type_colors = {
-                "Предложение": {"red": 0.9, "green": 1.0, "blue": 0.9},
-                "Ошибка": {"red": 1.0, "green": 0.9, "blue": 0.9},
-                "Идея": {"red": 0.9, "green": 0.9, "blue": 1.0},
-                "Благодарность": {"red": 1.0, "green": 1.0, "blue": 0.9},
-            }
+            if self._queue.qsize():
+                logger.info(f"📥 Из локальной очереди восстановлено отзывов: {self._queue.qsize()}")
             
-            if type_value in type_colors:
-                self.sheet.format(type_cell, {
-                    "backgroundColor": type_colors[type_value],
-                    "horizontalAlignment": "CENTER"
-                })
+            self._worker = threading.Thread(target=self._drain, daemon=True)
+            self._worker.start()
+    
+    def _enqueue(self, item: Dict[str, Any]):
+        """
+        Сохранение отзыва в SQLite и постановка в очередь на запись.
+        """
+        self._start_worker()
+        payload = json.dumps(item, ensure_ascii=False, default=str)
+        # put под той же блокировкой: id попадают в очередь по возрастанию
+        with self._queue_lock:
+            item_id = self._queue_db.execute(
+                "INSERT INTO pending (payload) VALUES (?)", (payload,)
+            ).lastrowid
+            self._queue.put((item_id, item))
+    
+    def _drain(self):
+        """
+        Фоновый поток: собирает пачку отзывов и пишет ее одним запросом.
+        """
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + QUEUE_FLUSH_DELAY
+            while len(batch) < QUEUE_BATCH_SIZE:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=timeout))
+                except queue.Empty:
+                    break
             
-            # Автоподбор ширины для комментария
-            comment_cell = f"H{row_number}"
-            self.sheet.format(comment_cell, {
-                "wrapStrategy": "WRAP",
-                "verticalAlignment": "TOP"
-            })
+            # Пачка повторяется, пока не запишется: порядок строк сохраняется
+            failures = 0
+            while not self._try_write_batch(batch):
+                failures += 1
+                delay = min(QUEUE_RETRY_MAX_DELAY, QUEUE_RETRY_DELAY * 2 ** (failures - 1))
+                logger.warning(f"⏳ Повтор записи пачки через {delay} сек")
+                time.sleep(delay)
+            
+            for _ in batch:
+                self._queue.task_done()
+    
+    def _try_write_batch(self, batch: List[tuple]) -> bool:
+        """_write_batch, не роняющий фоновый поток."""
+        try:
+            return self._write_batch(batch)
+        except Exception as e:
+            logger.exception(f"❌ Непредвиденная ошибка записи пачки: {e}")
+            return False
+    
+    def flush(self):
+        """
+        Ожидание записи в таблицу всех отзывов из очереди.
+        """
+        if self._worker is not None and self._worker.is_alive():
+            self._queue.join()
+    
+    def _write_batch(self, batch: List[tuple]) -> bool:
+        """
+        Запись пачки отзывов: values.append + одно форматирование всех строк.
+        
+        Returns:
+            bool: Записаны ли строки (иначе пачку нужно повторить)
+        """
+        rows = [item["row"] for _, item in batch]
+        
+        try:
+            if not self.sheet and not self.connect():
+                raise ConnectionError("Не удалось подключиться к Google Sheets")
             
+            # Агрегаты нужны до добавления строк, иначе пересчет
+            # с таблицы учтет новые строки дважды. Без них строки все равно
+            # пишутся: статистику потом пересчитаем по таблице вместе с ними
+            try:
+                self._ensure_aggregates()
+                count_stats = True
+            except Exception as e:
+                logger.warning(f"⚠️ Статистика недоступна, пишем без нее: {e}")
+                count_stats = False
+            
+            # Все строки пачки — один запрос values.append. Номер первой
+            # строки берем из ответа API (updates.updatedRange,
+            # например "Sheet1!A42:N51") — без get_all_values()
+            request = self._svc.spreadsheets().values().append(
+                spreadsheetId=self.spreadsheet_id,
+                range=absolute_range_name(self.sheet.title, "A:N"),
+                valueInputOption="RAW",
+                insertDataOption="INSERT_ROWS",
+                body={"values": rows}
+            )
+            response = self._write(self._execute, request, num_retries=3)
+        except Exception as e:
+            logger.error(f"❌ Ошибка сохранения пачки из {len(rows)} отзывов: {e}")
+            # 4xx (кроме 429) сам не пройдет — например, лист переименовали;
+            # при следующей попытке подключаемся заново
+            if self._is_client_error(e):
+                self.sheet = None
+            return False
+        
+        # Строки уже в таблице — дальше ничто не должно вызвать повтор пачки
+        self._forget_written(item_id for item_id, _ in batch)
+        
+        try:
+            self._after_append(batch, rows, response, count_stats)
+        except Exception as e:
+            logger.exception(f"❌ Строки записаны, но обработка после записи не удалась: {e}")
+            # Агрегаты могли обновиться не полностью — сверим с таблицей
+            self._agg_synced_at = float("-inf")
+        
+        return True
+    
+    @staticmethod
+    def _is_client_error(e: Exception) -> bool:
+        """Ошибка запроса 4xx (кроме 429), которую бесполезно повторять как есть."""
+        if isinstance(e, HttpError):
+            status = int(e.resp.status)
+        elif isinstance(e, gspread.exceptions.APIError):
+            status = e.response.status_code
+        else:
+            return False
+        return 400 <= status < 500 and status != 429
+    
+    def _forget_written(self, ids):
+        """
+        Удаление записанных строк из локальной очереди.
+        
+        Если SQLite недоступен, id запоминаются и удаляются вместе
+        со следующей пачкой.
+        """
+        with self._queue_lock:
+            self._written_ids.update(ids)
+            try:
+                self._queue_db.executemany(
+                    "DELETE FROM pending WHERE id = ?",
+                    [(item_id,) for item_id in self._written_ids]
+                )
+            except sqlite3.Error as e:
+                logger.error(f"❌ Ошибка очистки локальной очереди: {e}")
+                return
+            self._written_ids.clear()
+    
+    def _after_append(self, batch: List[tuple], rows: List[List], response: Dict,
+                      count_stats: bool):
+        """
+        Форматирование, статистика и вебхуки для уже записанной пачки.
+        
+        Строки учитываются в агрегатах только при count_stats — если агрегаты
+        были загружены до записи.
+        """
+        updated_range = response["updates"]["updatedRange"]
+        first_row, _ = a1_to_rowcol(updated_range.split("!")[-1].split(":")[0])
+        logger.info(f"✅ Сохранено отзывов: {len(rows)} (строки {first_row}-{first_row + len(rows) - 1})")
+        
+        try:
+            # Форматирование всех строк пачки — один запрос batch_update
+            format_requests = []
+            for row_number, row_data in enumerate(rows, start=first_row):
+                format_requests.extend(self._format_new_row(row_number, row_data[5], row_data[6]))
+            request = self._svc.spreadsheets().batchUpdate(
+                spreadsheetId=self.spreadsheet_id,
+                body={"requests": format_requests}
+            )
+            self._write(self._execute, request, num_retries=3)
         except Exception as e:
-            logger.warning(f"⚠️ Не удалось отформатировать строку {row_number}: {e}")
+            logger.warning(f"⚠️ Не удалось отформатировать новые строки: {e}")
+        
+        # Обновляем статистику за O(1) на строку вместо пересчета всей таблицы
+        if count_stats:
+            with self._agg_lock:
+                for row_number, row_data in enumerate(rows, start=first_row):
+                    fields = [row_data[i] for i in _ROW_STATS_POSITIONS]
+                    self._update_aggregates(self._agg, *fields)
+                    if self._refreshing:
+                        self._refresh_backlog.append((row_number, fields))
+                self._save_aggregates()
+        
+        # Вебхук-уведомления (опционально) — в отдельном потоке, чтобы
+        # медленный получатель не задерживал запись следующих пачек
+        notifications = [
+            (row_number, item["user"], item["feedback"])
+            for row_number, (_, item) in enumerate(batch, start=first_row)
+        ]
+        threading.Thread(
+            target=self._send_webhook_notifications,
+            args=(notifications,),
+            daemon=True
+        ).start()
+    
+    def _send_webhook_notifications(self, notifications: List[tuple]):
+        """
+        Отправка вебхуков по пачке отзывов (выполняется в фоновом потоке).
+        """
+        for row_number, user_data, feedback_data in notifications:
+            try:
+                self._send_webhook_notification(row_number, user_data, feedback_data)
+            except Exception as e:
+                logger.warning(f"⚠️ Не удалось отправить вебхук для строки {row_number}: {e}")
+    
+    @contextmanager
+    def batched(self):
+        """
+        Накопление запросов _queue_* и отправка одним batch_update на выходе.
+        
+        Пример:
+            with service.batched():
+                service._queue_update(sheet, 'A1', [['Заголовок']])
+                service._queue_format(sheet, 'A1', {'textFormat': {'bold': True}})
+        
+        При исключении внутри блока накопленные запросы не отправляются.
+        """
+        if self._pending_requests is not None:
+            # Вложенный batched — запросы уйдут вместе с внешним
+            yield
+            return
+        
+        requests = self._pending_requests = []
+        try:
+            yield
+        finally:
+            self._pending_requests = None
+        
+        if requests:
+            self._write(self.spreadsheet.batch_update, {"requests": requests})
+    
+    def _submit_requests(self, requests: List[Dict]):
+        """
+        Отправка запросов batch_update сразу или в очередь batched().
+        """
+        if self._pending_requests is not None:
+            self._pending_requests.extend(requests)
+        elif requests:
+            self._write(self.spreadsheet.batch_update, {"requests": requests})
+    
+    @staticmethod
+    def _cell_value(value: Any) -> Dict:
+        """Значение ячейки для updateCells (как value_input_option=RAW)."""
+        if isinstance(value, bool):
+            return {"boolValue": value}
+        if isinstance(value, (int, float)):
+            return {"numberValue": value}
+        return {"stringValue": str(value)}
+    
+    def _queue_update(self, worksheet, range_a1: str, values: List[List[Any]]):
+        """
+        Запись значений начиная с ячейки range_a1 (аналог worksheet.update).
+        """
+        row, col = a1_to_rowcol(range_a1.split(":")[0])
+        self._submit_requests([{
+            "updateCells": {
+                "start": {
+                    "sheetId": worksheet.id,
+                    "rowIndex": row - 1,
+                    "columnIndex": col - 1
+                },
+                "rows": [
+                    {"values": [{"userEnteredValue": self._cell_value(v)} for v in row_values]}
+                    for row_values in values
+                ],
+                "fields": "userEnteredValue"
+            }
+        }])
+    
+    def _queue_format(self, worksheet, range_a1: str, cell_format: Dict):
+        """
+        Форматирование диапазона (аналог worksheet.format).
+        """
+        self._submit_requests([self._repeat_cell_request(range_a1, cell_format, worksheet)])
+    
+    def _queue_merge(self, worksheet, range_a1: str):
+        """
+        Объединение ячеек (аналог worksheet.merge_cells).
+        """
+        self._submit_requests([{
+            "mergeCells": {
+                "range": a1_range_to_grid_range(range_a1, worksheet.id),
+                "mergeType": "MERGE_ALL"
+            }
+        }])
+    
+    def _repeat_cell_request(self, range_a1: str, cell_format: Dict,
+                             worksheet=None) -> Dict:
+        """
+        Запрос repeatCell для batch_update (то же, что делает sheet.format).
+        
+        Args:
+            range_a1: Диапазон в нотации A1
+            cell_format: Формат ячеек (CellFormat)
+            worksheet: Лист (по умолчанию основной)
+        """
+        worksheet = worksheet or self.sheet
+        return {
+            "repeatCell": {
+                "range": a1_range_to_grid_range(range_a1, worksheet.id),
+                "cell": {"userEnteredFormat": cell_format},
+                "fields": "userEnteredFormat(%s)" % ",".join(cell_format.keys())
+            }
+        }
+    
+    def _format_new_row(self, row_number: int, rating: Any,
+                        fb_type: Optional[str]) -> List[Dict]:
+        """
+        Запросы форматирования новой строки для лучшей читаемости.
+        
+        Оценка и тип передаются из save_feedback, а не читаются
+        обратно из таблицы через acell.
+        
+        Args:
+            row_number: Номер строки для форматирования
+            rating: Оценка 1-5
+            fb_type: Тип фидбека
+            
+        Returns:
+            List[Dict]: Запросы repeatCell для batch_update
+        """
+        requests = []
+        
+        # Форматируем оценку (цвет в зависимости от значения)
+        try:
+            rating = int(rating)
+        except (TypeError, ValueError):
+            rating = None
+        
+        # Цвета от красного (1) до зеленого (5)
+        colors = {
+            1: {"red": 1.0, "green": 0.8, "blue": 0.8},
+            2: {"red": 1.0, "green": 0.9, "blue": 0.7},
+            3: {"red": 1.0, "green": 1.0, "blue": 0.7},
+            4: {"red": 0.8, "green": 1.0, "blue": 0.8},
+            5: {"red": 0.7, "green": 1.0, "blue": 0.7},
+        }
+        
+        if rating in colors:
+            requests.append(self._repeat_cell_request(f"F{row_number}", {
+                "backgroundColor": colors[rating],
+                "horizontalAlignment": "CENTER",
+                "textFormat": {"bold": True, "fontSize": 11}
+            }))
+        
+        # Форматируем ячейку статуса
+        requests.append(self._repeat_cell_request(f"I{row_number}", {
+            "backgroundColor": {"red": 0.9, "green": 0.95, "blue": 1.0},
+            "horizontalAlignment": "CENTER",
+            "textFormat": {"bold": True}
+        }))
+        
+        # Форматируем ячейку типа фидбека
+        type_colors = {
+            "Предложение": {"red": 0.9, "green": 1.0, "blue": 0.9},
+            "Ошибка": {"red": 1.0, "green": 0.9, "blue": 0.9},
+            "Идея": {"red": 0.9, "green": 0.9, "blue": 1.0},
+            "Благодарность": {"red": 1.0, "green": 1.0, "blue": 0.9},
+        }
+        
+        if fb_type in type_colors:
+            requests.append(self._repeat_cell_request(f"G{row_number}", {
+                "backgroundColor": type_colors[fb_type],
+                "horizontalAlignment": "CENTER"
+            }))
+        
+        # Перенос текста для комментария
+        requests.append(self._repeat_cell_request(f"H{row_number}", {
+            "wrapStrategy": "WRAP",
+            "verticalAlignment": "TOP"
+        }))
+        
+        return requests
     
     def _send_webhook_notification(self, row_number: int, 
                                   user_data: Dict, feedback_data: Dict):
         """
         Отправка уведомления через вебхук (опционально).
         Можно подключить к Slack, Discord, Telegram и т.д.
+        
+        Вызывается из отдельного потока, блокирующий HTTP-запрос здесь допустим.
         """
         # Это опциональная функция - можно реализовать позже
         pass
@@ -392,7 +987,7 @@ class GoogleSheetsService:
                 self.connect()
             
             # Получаем все значения (кроме заголовка)
-            all_values = self.sheet.get_all_values()
+            all_values = self._read(self.sheet.get_all_values)
             
             if len(all_values) <= 1:
                 return []
@@ -404,9 +999,7 @@ class GoogleSheetsService:
             feedbacks = []
             for i, row in enumerate(data, start=2):  # start=2 потому что заголовок в строке 1
                 if len(row) >= len(headers):
-                    feedback = {}
-                    for j, header in enumerate(headers):
-                        feedback[header] = row[j] if j < len(row) else ""
+                    feedback = dict(zip(headers, row))
                     feedback["_row"] = i  # Добавляем номер строки
                     feedbacks.append(feedback)
             
@@ -416,27 +1009,235 @@ class GoogleSheetsService:
             logger.error(f"❌ Ошибка получения отзывов: {e}")
             return []
     
+    @staticmethod
+    def _empty_aggregates() -> Dict[str, Any]:
+        """Пустые агрегаты статистики."""
+        return {
+            "total": 0,
+            "rating_sum": 0,
+            "rating_hist": [0] * 6,  # индекс = оценка 1-5
+            "type_counts": Counter(),
+            "status_counts": Counter(),
+            "by_date": Counter(),    # "YYYY-MM-DD" -> количество
+            "with_comments": 0,
+            "last_timestamp": None,
+        }
+    
+    @staticmethod
+    def _update_aggregates(agg: Dict[str, Any], timestamp: Any, rating: Any,
+                           fb_type: str, comment: str, status: str):
+        """
+        Учет одной строки отзыва в агрегатах (колонки STATS_COLUMNS).
+        
+        Значения могут быть строками (как записаны ботом) или числами
+        (UNFORMATTED_VALUE при пересчете с таблицы).
+        """
+        agg["total"] += 1
+        
+        # Рейтинги
+        if isinstance(rating, str):
+            rating = int(rating) if rating.isdigit() else None
+        elif isinstance(rating, float) and rating.is_integer():
+            rating = int(rating)
+        if isinstance(rating, int) and 1 <= rating <= 5:
+            agg["rating_sum"] += rating
+            agg["rating_hist"][rating] += 1
+        
+        # Распределение по типам и статусам
+        agg["type_counts"][fb_type] += 1
+        agg["status_counts"][status] += 1
+        
+        # Комментарии
+        if str(comment).strip():
+            agg["with_comments"] += 1
+        
+        # Дата, введенная в таблице вручную, приходит серийным числом
+        if isinstance(timestamp, (int, float)):
+            timestamp = (SHEETS_EPOCH + timedelta(days=timestamp)).isoformat(
+                sep=" ", timespec="seconds"
+            )
+        
+        # Дата для подсчета за сегодня/неделю. Формат фиксирован
+        # ("%Y-%m-%d %H:%M:%S"), поэтому режем строку вместо strptime
+        timestamp = str(timestamp)
+        try:
+            date(int(timestamp[0:4]), int(timestamp[5:7]), int(timestamp[8:10]))
+        except ValueError:
+            logger.debug(f"Некорректная дата отзыва: {timestamp!r}")
+        else:
+            agg["by_date"][timestamp[:10]] += 1
+        
+        agg["last_timestamp"] = timestamp
+    
+    def _aggregates_key(self) -> str:
+        """
+        Ключ файла статистики: таблица и набор колонок статистики.
+        
+        Файл от другой таблицы (сменили SPREADSHEET_ID) или от другой
+        схемы колонок не используется и пересчитывается.
+        """
+        return hashlib.sha1(
+            f"{self.spreadsheet_id}:{','.join(STATS_COLUMNS)}".encode()
+        ).hexdigest()
+    
+    def _load_aggregates(self) -> Optional[Dict[str, Any]]:
+        """
+        Чтение агрегатов из файла.
+        
+        Returns:
+            Optional[Dict]: Агрегаты или None, если файла нет, он поврежден
+            или сохранен для другой таблицы
+        """
+        try:
+            with open(self._agg_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get("key") != self._aggregates_key():
+                logger.info("🔄 Файл статистики относится к другой таблице")
+                return None
+            agg = data["agg"]
+            if set(agg) != set(self._empty_aggregates()):
+                raise ValueError("неизвестный формат")
+            for key in ("type_counts", "status_counts", "by_date"):
+                agg[key] = Counter(agg[key])
+            return agg
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, KeyError, AttributeError) as e:
+            logger.warning(f"⚠️ Файл статистики {self._agg_file} не прочитан: {e}")
+            return None
+    
+    def _save_aggregates(self):
+        """
+        Атомарная запись агрегатов в файл (через временный файл).
+        """
+        tmp_file = f"{self._agg_file}.tmp"
+        try:
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                json.dump({"key": self._aggregates_key(), "agg": self._agg},
+                          f, ensure_ascii=False)
+            os.replace(tmp_file, self._agg_file)
+        except OSError as e:
+            logger.warning(f"⚠️ Не удалось сохранить статистику: {e}")
+    
+    def _rebuild_aggregates_from_sheet(self) -> Dict[str, Any]:
+        """
+        Полный пересчет агрегатов по таблице.
+        
+        Дорогая операция (читает весь лист), выполняется только если
+        файла статистики нет или явно запрошено обновление.
+        """
+        logger.info("🔄 Пересчитываем статистику по всей таблице...")
+        
+        # Позиции нужных колонок считаются один раз, строки не
+        # превращаются в словари
+        positions = [self._header_index.get(column) for column in STATS_COLUMNS]
+        
+        # Только строки данных и только колонки до последней нужной;
+        # числа приходят числами, без разбора строк
+        last_column = max((i for i in positions if i is not None), default=0) + 1
+        rows = self._read(
+            self.sheet.get,
+            f"A2:{rowcol_to_a1(1, max(last_column, len(HEADERS)))[:-1]}",
+            value_render_option="UNFORMATTED_VALUE",
+            date_time_render_option="SERIAL_NUMBER"
+        )
+        
+        agg = self._empty_aggregates()
+        for row in rows:
+            self._update_aggregates(agg, *(
+                row[i] if i is not None and i < len(row) else ""
+                for i in positions
+            ))
+        
+        return agg
+    
+    def _ensure_aggregates(self) -> Dict[str, Any]:
+        """
+        Агрегаты из памяти, из файла или (один раз) пересчетом по таблице.
+        """
+        if self._agg is None:
+            self._agg = self._load_aggregates()
+            # Файл мог устареть — сверим с таблицей в фоне
+            self._agg_synced_at = time.monotonic() - self.CACHE_TIMEOUT - 1
+        
+        if self._agg is None:
+            if not self.sheet and not self.connect():
+                raise ConnectionError("Не удалось подключиться к Google Sheets")
+            self._agg = self._rebuild_aggregates_from_sheet()
+            self._agg_synced_at = time.monotonic()
+            self._save_aggregates()
+        
+        return self._agg
+    
+    def _begin_refresh(self) -> bool:
+        """
+        Отмечает начало сверки. False, если сверка уже идет.
+        """
+        with self._agg_lock:
+            if self._refreshing:
+                return False
+            self._refreshing = True
+            self._refresh_backlog = []
+            return True
+    
+    def _refresh_stats(self):
+        """
+        Сверка агрегатов с таблицей (запускается после _begin_refresh).
+        
+        Строки, сохраненные во время чтения листа и не попавшие в него,
+        досчитываются из _refresh_backlog.
+        """
+        try:
+            if not self.sheet and not self.connect():
+                raise ConnectionError("Не удалось подключиться к Google Sheets")
+            agg = self._rebuild_aggregates_from_sheet()
+        except Exception as e:
+            logger.warning(f"⚠️ Не удалось обновить статистику: {e}")
+            with self._agg_lock:
+                self._refreshing = False
+                self._refresh_backlog = []
+            return
+        
+        with self._agg_lock:
+            # Данные в строках 2..total+1 уже учтены при чтении листа
+            for row_number, row in self._refresh_backlog:
+                if row_number > agg["total"] + 1:
+                    self._update_aggregates(agg, *row)
+            
+            self._agg = agg
+            self._agg_synced_at = time.monotonic()
+            self._refreshing = False
+            self._refresh_backlog = []
+            self._save_aggregates()
+    
     def get_statistics(self, force_refresh: bool = False) -> Dict[str, Any]:
         """
-        Получение статистики по отзывам с кэшированием.
+        Получение статистики по отзывам из инкрементальных агрегатов.
+        
+        Устаревшие агрегаты отдаются сразу, а сверка с таблицей идет
+        в фоновом потоке (stale-while-revalidate).
         
         Args:
-            force_refresh: Игнорировать кэш и обновить данные
+            force_refresh: Синхронно сверить агрегаты с таблицей
             
         Returns:
             Dict: Статистика
         """
-        # Проверяем кэш
-        if (not force_refresh and self._stats_cache and 
-            self._cache_time and 
-            (datetime.now() - self._cache_time).seconds < self.CACHE_TIMEOUT):
-            return self._stats_cache
-        
         try:
-            feedbacks = self.get_all_feedbacks()
+            self._ensure_aggregates()
+            
+            age = time.monotonic() - self._agg_synced_at
+            if force_refresh or age > self.CACHE_TIMEOUT + self.CACHE_GRACE:
+                if self._begin_refresh():
+                    self._refresh_stats()
+            elif age > self.CACHE_TIMEOUT and self._begin_refresh():
+                threading.Thread(target=self._refresh_stats, daemon=True).start()
+            
+            agg = self._agg
+            total = agg["total"]
             
-            if not feedbacks:
-                stats = {
+            if not total:
+                return {
                     "total": 0,
                     "average_rating": 0,
                     "rating_distribution": {},
@@ -447,79 +1248,36 @@ class GoogleSheetsService:
                     "status_distribution": {},
                     "last_update": "Нет данных"
                 }
-            else:
-                # Считаем статистику
-                ratings = []
-                type_counts = {}
-                status_counts = {}
-                today_count = 0
-                week_count = 0
-                with_comments = 0
-                
-                today = datetime.now().date()
-                
-                for fb in feedbacks:
-                    # Рейтинги
-                    if fb.get("Rating") and fb["Rating"].isdigit():
-                        rating = int(fb["Rating"])
-                        ratings.append(rating)
-                    
-                    # Распределение по типам
-                    fb_type = fb.get("Type", "Не указан")
-                    type_counts[fb_type] = type_counts.get(fb_type, 0) + 1
-                    
-                    # Распределение по статусам
-                    status = fb.get("Status", "Не указан")
-                    status_counts[status] = status_counts.get(status, 0) + 1
-                    
-                    # Комментарии
-                    if fb.get("Comment", "").strip():
-                        with_comments += 1
-                    
-                    # Дата для подсчета за сегодня/неделю
-                    try:
-                        fb_date = datetime.strptime(fb.get("Timestamp", ""), 
-                                                   "%Y-%m-%d %H:%M:%S").date()
-                        if fb_date == today:
-                            today_count += 1
-                        
-                        # За последние 7 дней
-                        days_diff = (today - fb_date).days
-                        if days_diff <= 7:
-                            week_count += 1
-                    except:
-                        pass
-                
-                # Распределение оценок
-                rating_dist = {str(i): 0 for i in range(1, 6)}
-                for r in ratings:
-                    rating_dist[str(r)] = rating_dist.get(str(r), 0) + 1
-                
-                # Средний рейтинг
-                avg_rating = sum(ratings) / len(ratings) if ratings else 0
-                
-                # Форматируем процент комментариев
-                comment_percentage = (with_comments / len(feedbacks)) * 100 if feedbacks else 0
-                
-                stats = {
-                    "total": len(feedbacks),
-                    "average_rating": round(avg_rating, 2),
-                    "rating_distribution": rating_dist,
-                    "type_distribution": type_counts,
-                    "status_distribution": status_counts,
-                    "last_week": week_count,
-                    "today": today_count,
-                    "with_comments": with_comments,
-                    "comment_percentage": round(comment_percentage, 1),
-                    "last_update": feedbacks[0].get("Timestamp", "") if feedbacks else "Нет данных",
-                    "success_rate": round((avg_rating / 5) * 100, 1) if avg_rating > 0 else 0
-                }
             
-            # Сохраняем в кэш
-            self._stats_cache = stats
-            self._cache_time = datetime.now()
+            # Распределение оценок и средний рейтинг
+            rating_dist = {str(i): agg["rating_hist"][i] for i in range(1, 6)}
+            rated = sum(agg["rating_hist"])
+            avg_rating = agg["rating_sum"] / rated if rated else 0
             
-            return stats
+            # Отзывы за сегодня и за последние 7 дней
+            today = datetime.now().date()
+            today_count = agg["by_date"].get(today.isoformat(), 0)
+            week_count = sum(
+                count for day, count in agg["by_date"].items()
+                if (today - date.fromisoformat(day)).days <= 7
+            )
+            
+            # Форматируем процент комментариев
+            comment_percentage = (agg["with_comments"] / total) * 100
+            
+            return {
+                "total": total,
+                "average_rating": round(avg_rating, 2),
+                "rating_distribution": rating_dist,
+                "type_distribution": dict(agg["type_counts"]),
+                "status_distribution": dict(agg["status_counts"]),
+                "last_week": week_count,
+                "today": today_count,
+                "with_comments": agg["with_comments"],
+                "comment_percentage": round(comment_percentage, 1),
+                "last_update": agg["last_timestamp"] or "Нет данных",
+                "success_rate": round((avg_rating / 5) * 100, 1) if avg_rating > 0 else 0
+            }
             
         except Exception as e:
             logger.error(f"❌ Ошибка расчета статистики: {e}")
@@ -540,29 +1298,12 @@ class GoogleSheetsService:
             
             # Проверяем, существует ли уже дашборд
             try:
-                dashboard = self.spreadsheet.worksheet(dashboard_title)
+                dashboard = self._read(self.spreadsheet.worksheet, dashboard_title)
                 logger.info("✅ Дашборд уже существует")
                 return dashboard
             except gspread.exceptions.WorksheetNotFound:
                 pass
             
-            # Создаем новый лист
-            dashboard = self.spreadsheet.add_worksheet(
-                title=dashboard_title,
-                rows=50,
-                cols=20
-            )
-            
-            # Заполняем дашборд
-            dashboard.update('A1', [['📊 ДАШБОРД ОБРАТНОЙ СВЯЗИ']])
-            dashboard.format('A1', {
-                'textFormat': {'bold': True, 'fontSize': 16},
-                'horizontalAlignment': 'CENTER'
-            })
-            
-            # Объединяем ячейки для заголовка
-            dashboard.merge_cells('A1:E1')
-            
             # Добавляем статистику
             stats = self.get_statistics(force_refresh=True)
             
@@ -595,16 +1336,37 @@ class GoogleSheetsService:
                 percentage = (count / stats['total'] * 100) if stats['total'] > 0 else 0
                 dashboard_data.append([fb_type, f'{count} ({round(percentage, 1)}%)'])
             
-            # Обновляем данные
-            dashboard.update('A3', dashboard_data)
-            
-            # Форматируем
-            dashboard.format('A3:A10', {'textFormat': {'bold': True}})
-            dashboard.format('A12', {'textFormat': {'bold': True, 'fontSize': 14}})
-            dashboard.format('A22', {'textFormat': {'bold': True, 'fontSize': 14}})
+            # Новый лист сразу нужного размера. sheetId задаем сами, чтобы
+            # ссылаться на лист в том же batch_update
+            properties = {
+                "sheetId": random.randrange(1, 2 ** 31),
+                "title": dashboard_title,
+                "gridProperties": {
+                    "rowCount": len(dashboard_data) + 10,
+                    "columnCount": 3
+                }
+            }
+            dashboard = gspread.Worksheet(self.spreadsheet, properties)
             
-            # Настраиваем ширину колонок
-            dashboard.resize(rows=len(dashboard_data) + 10, cols=3)
+            # Создаем, заполняем и форматируем дашборд одним запросом
+            with self.batched():
+                self._submit_requests([{"addSheet": {"properties": properties}}])
+                self._queue_update(dashboard, 'A1', [['📊 ДАШБОРД ОБРАТНОЙ СВЯЗИ']])
+                self._queue_format(dashboard, 'A1', {
+                    'textFormat': {'bold': True, 'fontSize': 16},
+                    'horizontalAlignment': 'CENTER'
+                })
+                
+                # Объединяем ячейки для заголовка (на всю ширину листа)
+                self._queue_merge(dashboard, 'A1:C1')
+                
+                # Обновляем данные
+                self._queue_update(dashboard, 'A3', dashboard_data)
+                
+                # Форматируем
+                self._queue_format(dashboard, 'A3:A10', {'textFormat': {'bold': True}})
+                self._queue_format(dashboard, 'A12', {'textFormat': {'bold': True, 'fontSize': 14}})
+                self._queue_format(dashboard, 'A22', {'textFormat': {'bold': True, 'fontSize': 14}})
             
             logger.info("✅ Дашборд создан успешно")
             return dashboard
@@ -621,29 +1383,23 @@ class GoogleSheetsService:
             filename: Имя файла для экспорта
         """
         try:
-            feedbacks = self.get_all_feedbacks()
+            if not self.sheet:
+                self.connect()
+            
+            # Берем значения листа как есть (заголовок + строки), без
+            # промежуточных словарей из get_all_feedbacks()
+            all_values = self._read(self.sheet.get_all_values)
             
-            if not feedbacks:
+            if len(all_values) <= 1:
                 logger.warning("⚠️ Нет данных для экспорта")
                 return False
             
             import csv
             
-            with open(filename, 'w', newline='', encoding='utf-8') as csvfile:
-                # Получаем заголовки из первого отзыва
-                if feedbacks:
-                    fieldnames = list(feedbacks[0].keys())
-                    # Убираем служебное поле
-                    if '_row' in fieldnames:
-                        fieldnames.remove('_row')
-                    
-                    writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-                    writer.writeheader()
-                    
-                    for fb in feedbacks:
-                        # Копируем без служебных полей
-                        row = {k: v for k, v in fb.items() if k != '_row'}
-                        writer.writerow(row)
+            with open(filename, 'w', newline='', encoding='utf-8',
+                      buffering=1 << 20) as csvfile:
+                # Модуль csv пишет все строки за один вызов
+                csv.writer(csvfile).writerows(all_values)
             
             logger.info(f"✅ Данные экспортированы в {filename}")
             return True
@@ -681,7 +1437,7 @@ class GoogleSheetsService:
             
             # Тест 2: Чтение
             try:
-                cell_value = self.sheet.acell('A1').value
+                cell_value = self._read(self.sheet.acell, 'A1').value
                 test_results["can_read"] = True
                 test_results["details"]["first_cell"] = cell_value
             except Exception as e:
@@ -690,22 +1446,22 @@ class GoogleSheetsService:
             # Тест 3: Запись
             try:
                 test_cell = 'Z100'  # Далекая ячейка, чтобы не мешать данным
-                original_value = self.sheet.acell(test_cell).value
+                original_value = self._read(self.sheet.acell, test_cell).value
                 
                 # Пытаемся записать и прочитать обратно
                 test_value = f"TEST_{datetime.now().timestamp()}"
-                self.sheet.update(test_cell, test_value)
+                self._write(self.sheet.update, test_cell, test_value)
                 
                 # Проверяем запись
-                written_value = self.sheet.acell(test_cell).value
+                written_value = self._read(self.sheet.acell, test_cell).value
                 if written_value == test_value:
                     test_results["can_write"] = True
                 
                 # Восстанавливаем оригинальное значение
                 if original_value is None:
-                    self.sheet.update(test_cell, '')
+                    self._write(self.sheet.update, test_cell, '')
                 else:
-                    self.sheet.update(test_cell, original_value)
+                    self._write(self.sheet.update, test_cell, original_value)
                     
             except Exception as e:
                 test_results["errors"].append(f"Ошибка записи: {e}")
@@ -728,12 +1484,12 @@ def setup_google_sheets():
     """
     Инициализация Google Sheets для бота.
     """
-    from config import Config
+    from config import config
     
-    # Создаем экземпляр сервиса
-    sheets_service = GoogleSheetsService(
+    # Получаем общий экземпляр сервиса
+    sheets_service = GoogleSheetsService.instance(
         credentials_file="credentials.json",
-        spreadsheet_id=Config.SPREADSHEET_ID
+        spreadsheet_id=config.SPREADSHEET_ID
     )
     
     # Тестируем подключение
@@ -794,6 +1550,9 @@ if __name__ == "__main__":
         result = service.save_feedback(test_user, test_feedback)
         print(f"✅ Тестовый отзыв: {result.get('message', 'Отправлен')}")
         
+        # Дожидаемся фоновой записи в таблицу
+        service.flush()
+        
         # Экспорт данных
         service.export_to_csv("demo_export.csv")
         print("✅ Данные экспортированы в demo_export.csv")
\ No newline at end of file
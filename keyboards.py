@@ -1,7 +1,20 @@
+from functools import lru_cache
+
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 
+__all__ = [
+    "get_main_menu",
+    "get_rating_keyboard",
+    "get_feedback_type_keyboard",
+    "get_confirmation_keyboard"
+]
+
+# Клавиатуры статичны: каждая собирается один раз, дальше
+# возвращается тот же объект InlineKeyboardMarkup
+
 
+@lru_cache(maxsize=1)
 def get_main_menu() -> InlineKeyboardMarkup:
     """Главное меню."""
     builder = InlineKeyboardBuilder()
@@ -14,6 +27,7 @@ def get_main_menu() -> InlineKeyboardMarkup:
     return builder.as_markup()
 
 
+@lru_cache(maxsize=1)
 def get_rating_keyboard() -> InlineKeyboardMarkup:
     """Клавиатура для оценки."""
     builder = InlineKeyboardBuilder()
@@ -34,6 +48,7 @@ def get_rating_keyboard() -> InlineKeyboardMarkup:
     return builder.as_markup()
 
 
+@lru_cache(maxsize=1)
 def get_feedback_type_keyboard() -> InlineKeyboardMarkup:
     """Выбор типа фидбека."""
     builder = InlineKeyboardBuilder()
@@ -53,6 +68,7 @@ def get_feedback_type_keyboard() -> InlineKeyboardMarkup:
     return builder.as_markup()
 
 
+@lru_cache(maxsize=1)
 def get_confirmation_keyboard() -> InlineKeyboardMarkup:
     """Подтверждение отправки."""
     builder = InlineKeyboardBuilder()
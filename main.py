@@ -1,14 +1,25 @@
 import asyncio
+import logging
 from datetime import datetime
+from types import MappingProxyType
 from aiogram import Bot, Dispatcher, F
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.exceptions import TelegramAPIError
 from aiogram.filters import CommandStart, Command
 from aiogram.types import Message, CallbackQuery
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
+from aiogram.fsm.storage.base import BaseStorage, DefaultKeyBuilder
 from aiogram.fsm.storage.memory import MemoryStorage
 
-from config import Config
-from keyboards import *
+from config import config, setup_logging
+from keyboards import (
+    get_main_menu,
+    get_rating_keyboard,
+    get_feedback_type_keyboard,
+    get_confirmation_keyboard
+)
+from middlewares import PerChatConcurrencyMiddleware
 from google_sheets import sheets_manager
 
 
@@ -20,16 +31,98 @@ class FeedbackState(StatesGroup):
     confirmation = State()
 
 
+logger = logging.getLogger(__name__)
+
+
+def _create_storage() -> BaseStorage:
+    """Хранилище FSM: Redis, если задан REDIS_URL, иначе память процесса."""
+    if not config.REDIS_URL:
+        return MemoryStorage()
+    
+    # Импорт здесь: пакет redis нужен только при общем хранилище
+    from aiogram.fsm.storage.redis import RedisStorage
+    
+    # Ключ (bot_id, chat_id, user_id) — несколько процессов бота делят
+    # состояния, не смешивая диалоги разных чатов и ботов
+    return RedisStorage.from_url(
+        config.REDIS_URL,
+        key_builder=DefaultKeyBuilder(with_bot_id=True)
+    )
+
+
+# keepalive соединений с api.telegram.org дольше, чем 15 с у aiohttp,
+# чтобы между всплесками нажатий не открывать TLS-соединения заново
+TELEGRAM_KEEPALIVE_TIMEOUT = 75  # сек
+
+
+class KeepAliveAiohttpSession(AiohttpSession):
+    """AiohttpSession, чей TCPConnector держит соединения keepalive_timeout сек.
+    
+    У AiohttpSession нет параметра для keepalive_timeout: аргументы коннектора
+    aiogram хранит в приватном словаре _connector_init (aiogram закреплен
+    в requirements.txt). Если после обновления aiogram словаря нет, сессия
+    работает с настройками по умолчанию и пишет предупреждение в лог.
+    """
+    
+    def __init__(self, keepalive_timeout: float, **kwargs):
+        super().__init__(**kwargs)
+        connector_init = getattr(self, "_connector_init", None)
+        if isinstance(connector_init, dict):
+            connector_init["keepalive_timeout"] = keepalive_timeout
+        else:
+            logger.warning("⚠️ keepalive_timeout не применен: изменился AiohttpSession")
+
+
 # Инициализация
-bot = Bot(token=Config.BOT_TOKEN)
-dp = Dispatcher(storage=MemoryStorage())
+bot = Bot(
+    token=config.BOT_TOKEN,
+    session=KeepAliveAiohttpSession(keepalive_timeout=TELEGRAM_KEEPALIVE_TIMEOUT)
+)
+dp = Dispatcher(storage=_create_storage())
+dp.update.middleware(PerChatConcurrencyMiddleware())
+
+# Фоновые задачи держим в наборе, иначе их может собрать сборщик мусора
+_background_tasks: set[asyncio.Task] = set()
+
+
+def _answer_callback(callback: CallbackQuery):
+    """Ответ на нажатие кнопки в фоне — без ожидания, параллельно с edit_text."""
+    # answer() возвращает метод API (awaitable, но не корутину) — оборачиваем в задачу
+    task = asyncio.ensure_future(callback.answer())
+    _background_tasks.add(task)
+    task.add_done_callback(_background_task_done)
+
+
+def _background_task_done(task: asyncio.Task):
+    """Снятие задачи с учета; ошибку пишем в лог, а не в «exception was never retrieved»."""
+    _background_tasks.discard(task)
+    if not task.cancelled() and task.exception() is not None:
+        logger.warning(f"⚠️ Ошибка фоновой задачи: {task.exception()}")
+
+
+async def _edit_message(callback: CallbackQuery, text: str, reply_markup=None):
+    """Правка сообщения с кнопками: отправляем только то, что изменилось."""
+    message = callback.message
+    if message.text == text:
+        # Текст тот же (повторное нажатие) — меняем только клавиатуру, если нужно
+        if message.reply_markup != reply_markup:
+            await message.edit_reply_markup(reply_markup=reply_markup)
+        return
+    await message.edit_text(text, reply_markup=reply_markup)
 
 
-# ==================== КОМАНДЫ ====================
-@dp.message(CommandStart())
-async def cmd_start(message: Message):
-    """Команда /start."""
-    welcome_text = """🌟 Добро пожаловать!
+# Отзывы на сохранение: обработчик кладет (user_info, data) и сразу
+# отвечает пользователю, запись и уведомление админа делает _sheets_worker
+feedback_queue: asyncio.Queue = asyncio.Queue()
+
+
+# ==================== ТЕКСТЫ ====================
+# Собираются один раз при импорте: ссылка на таблицу уже подставлена,
+# в шаблонах статистики остаются только поля {total}, {average}, {last_feedback},
+# в уведомлении админа — поля отзыва
+SPREADSHEET_URL = f"https://docs.google.com/spreadsheets/d/{config.SPREADSHEET_ID}"
+
+WELCOME_TEXT = """🌟 Добро пожаловать!
 
     🚀 Умный бот для сбора отзывов и обратной связи
 
@@ -46,31 +139,105 @@ async def cmd_start(message: Message):
     • Любой бизнес, которому важны отзывы
 
     👇 Выберите действие:"""
-    
-    await message.answer(welcome_text, reply_markup=get_main_menu())
 
+STATS_TEMPLATE = f"""📊 Статистика отзывов
 
-@dp.message(Command("stats"))
-async def cmd_stats(message: Message):
-    """Статистика."""
-    stats = sheets_manager.get_stats()
-    
-    stats_text = f"""📊 Статистика отзывов
-
-            📈 Всего отзывов: {stats['total']}
-            ⭐ Средний балл: {stats['average']}/5
-            🕒 Последний отзыв: {stats['last_feedback']}
+            📈 Всего отзывов: {{total}}
+            ⭐ Средний балл: {{average}}/5
+            🕒 Последний отзыв: {{last_feedback}}
 
             🔗 Ссылка на таблицу:
-            https://docs.google.com/spreadsheets/d/{Config.SPREADSHEET_ID}
+            {SPREADSHEET_URL}
 
             Данные обновляются в реальном времени!"""
+
+CURRENT_STATS_TEMPLATE = f"""📊 Текущая статистика отзывов
+
+            📈 Всего отзывов: {{total}}
+            ⭐ Средняя оценка: {{average}}/5
+            🕒 Последний отзыв: {{last_feedback}}
+
+            🔗 Таблица с данными:
+            {SPREADSHEET_URL}
+
+            Данные обновляются автоматически при каждом новом отзыве!"""
+
+SUBMIT_SUCCESS_TEXT = f"""🎉 Спасибо за ваш отзыв!
+
+            Ваше мнение очень ценно для нас.
+            Все данные сохранены в системе.
+
+            🔗 Результаты доступны в Google Таблице:
+            {SPREADSHEET_URL}
+
+            Вы можете оставить ещё один отзыв или посмотреть статистику."""
+
+SUBMIT_COOLDOWN_TEXT = f"""⏱ Вы только что отправили отзыв
+
+            Подождите {config.FEEDBACK_COOLDOWN} сек. и нажмите «Отправить» ещё раз —
+            данные этого отзыва сохранены в форме."""
+
+SUBMIT_FAILED_TEXT = """⚠️ Не удалось сохранить ваш отзыв
+
+            Попробуйте, пожалуйста, оставить его ещё раз чуть позже."""
+
+ADMIN_NOTIFICATION_TEMPLATE = """🔔 Новый отзыв!
+
+            👤 Пользователь: @{username}
+            ⭐ Оценка: {rating}/5
+            📂 Тип: {type}
+            💬 Комментарий: {comment}"""
+
+ABOUT_TEXT = f"""ℹ️ О проекте
+
+            🚀 Умный инструмент для сбора обратной связи
+
+            ✨ Технологии:
+            • Python и Aiogram 3.x
+            • Google Sheets API
+            • Асинхронная архитектура
+            • Система состояний (FSM)
+
+            🎯 Преимущества:
+            • Повышение лояльности клиентов
+            • Автоматизация сбора отзывов
+            • Удобный интерфейс для клиентов
+            • Интеграция с Google экосистемой
+
+            📊 Все данные сохраняются в Google Таблицу в реальном времени!
+
+            🔗 Ссылка на демо-таблицу:
+            {SPREADSHEET_URL}"""
+
+
+# ==================== КОМАНДЫ ====================
+@dp.message(CommandStart())
+async def cmd_start(message: Message):
+    """Команда /start."""
+    await message.answer(WELCOME_TEXT, reply_markup=get_main_menu())
+
+
+@dp.message(Command("stats"))
+async def cmd_stats(message: Message):
+    """Статистика."""
+    # get_stats может перечитать таблицу — выполняем в потоке, не блокируя event loop
+    stats = await asyncio.to_thread(sheets_manager.get_stats)
     
-    await message.answer(stats_text, reply_markup=get_main_menu())
+    await message.answer(STATS_TEMPLATE.format(**stats), reply_markup=get_main_menu())
 
 
 # ==================== ОБРАБОТКА КНОПОК ====================
-@dp.callback_query(F.data == "start_feedback")
+# callback_data кнопок оценки и типа → значение для сохранения
+# (только для чтения: справочники общие для всех обработчиков)
+_RATINGS = MappingProxyType({f"rate_{i}": i for i in range(1, 6)})
+_TYPES = MappingProxyType({
+    "type_suggestion": "Предложение",
+    "type_bug": "Ошибка",
+    "type_idea": "Идея",
+    "type_thanks": "Благодарность"
+})
+
+
 async def start_feedback(callback: CallbackQuery, state: FSMContext):
     """Начало сбора фидбека."""
     await state.set_state(FeedbackState.waiting_rating)
@@ -83,19 +250,12 @@ async def start_feedback(callback: CallbackQuery, state: FSMContext):
 
         Ваша оценка поможет стать лучше!"""
     
-    await callback.message.edit_text(text, reply_markup=get_rating_keyboard())
-    await callback.answer()
+    await _edit_message(callback, text, get_rating_keyboard())
 
 
-@dp.callback_query(F.data.startswith("rate_"))
 async def process_rating(callback: CallbackQuery, state: FSMContext):
     """Обработка оценки."""
-    # Фиксируем ошибку - проверяем, что это действительно оценка
-    try:
-        rating = int(callback.data.split("_")[1])
-    except (ValueError, IndexError):
-        await callback.answer("Ошибка обработки оценки")
-        return
+    rating = _RATINGS[callback.data]
     
     await state.update_data(rating=rating)
     await state.set_state(FeedbackState.waiting_type)
@@ -109,22 +269,12 @@ async def process_rating(callback: CallbackQuery, state: FSMContext):
         💡 Идея — новое предложение
         ❤️ Благодарность — хотите сказать спасибо"""
     
-    await callback.message.edit_text(text, reply_markup=get_feedback_type_keyboard())
-    await callback.answer()
+    await _edit_message(callback, text, get_feedback_type_keyboard())
 
 
-@dp.callback_query(F.data.startswith("type_"))
 async def process_type(callback: CallbackQuery, state: FSMContext):
     """Обработка типа фидбека."""
-    fb_type = callback.data.split("_")[1]
-    type_names = {
-        "suggestion": "Предложение",
-        "bug": "Ошибка",
-        "idea": "Идея",
-        "thanks": "Благодарность"
-    }
-    
-    await state.update_data(type=type_names[fb_type])
+    await state.update_data(type=_TYPES[callback.data])
     await state.set_state(FeedbackState.waiting_comment)
     
     text = """💬 Напишите ваш комментарий
@@ -135,8 +285,7 @@ async def process_type(callback: CallbackQuery, state: FSMContext):
 
         ❓ Можно пропустить, отправив команду /skip"""
     
-    await callback.message.edit_text(text)
-    await callback.answer()
+    await _edit_message(callback, text)
 
 
 @dp.message(FeedbackState.waiting_comment)
@@ -147,11 +296,10 @@ async def process_comment(message: Message, state: FSMContext):
     if comment == "/skip":
         comment = ""
     
-    await state.update_data(comment=comment)
+    # update_data возвращает все данные отзыва — отдельный get_data не нужен
+    data = await state.update_data(comment=comment)
     
     # Показываем подтверждение
-    data = await state.get_data()
-    
     preview = f"""📋 Проверьте данные перед отправкой:
 
         ⭐ Оценка: {data['rating']}/5
@@ -165,10 +313,13 @@ async def process_comment(message: Message, state: FSMContext):
 
 
 # ==================== ПОДТВЕРЖДЕНИЕ ====================
-@dp.callback_query(F.data == "submit")
 async def submit_feedback(callback: CallbackQuery, state: FSMContext):
     """Отправка фидбека."""
     data = await state.get_data()
+    # Повторное нажатие старой кнопки после state.clear(): отзыва нет
+    if "rating" not in data or "type" not in data:
+        await _edit_message(callback, WELCOME_TEXT, get_main_menu())
+        return
     user = callback.from_user
     
     # Подготавливаем данные пользователя
@@ -179,135 +330,194 @@ async def submit_feedback(callback: CallbackQuery, state: FSMContext):
         "last_name": user.last_name or ""
     }
     
-    # Сохраняем в Google Sheets
-    success = sheets_manager.save_feedback(user_info, data)
+    # Проверка дубля и кулдауна — в памяти, до ответа пользователю:
+    # отклоненный отзыв не должен выглядеть сохраненным
+    status = sheets_manager.check_feedback(user_info, data)
+    if status is False:
+        # Состояние не сбрасываем — отзыв можно отправить после кулдауна
+        await _edit_message(callback, SUBMIT_COOLDOWN_TEXT, get_confirmation_keyboard())
+        return
     
-    if success:
-        # Отправляем уведомление админу
-        if Config.ADMIN_ID:
-            admin_text = f"""🔔 Новый отзыв!
-
-            👤 Пользователь: @{user.username or 'без username'}
-            ⭐ Оценка: {data['rating']}/5
-            📂 Тип: {data['type']}
-            💬 Комментарий: {data.get('comment', 'Нет комментария')[:100]}"""
-            try:
-                await bot.send_message(Config.ADMIN_ID, admin_text)
-            except:
-                pass
-        
-        # Сообщение пользователю
-        text = """🎉 Спасибо за ваш отзыв!
-
-            Ваше мнение очень ценно для нас.
-            Все данные сохранены в системе.
-
-            🔗 Результаты доступны в Google Таблице:
-            https://docs.google.com/spreadsheets/d/{Config.SPREADSHEET_ID}
-
-            Вы можете оставить ещё один отзыв или посмотреть статистику."""
-        
-        # Вставляем реальный ID таблицы
-        text = text.replace("{Config.SPREADSHEET_ID}", Config.SPREADSHEET_ID)
-        
-    else:
-        text = """⚠️ Ошибка сохранения
-
-            Пожалуйста, попробуйте позже.
-            Мы уже работаем над исправлением."""
+    # Сохранение в Google Sheets — в фоне, пользователь не ждет.
+    # Дубль (status is None) уже принят — повторно не ставим
+    if status:
+        await feedback_queue.put((user_info, data))
     
-    await callback.message.edit_text(text, reply_markup=get_main_menu())
+    await _edit_message(callback, SUBMIT_SUCCESS_TEXT, get_main_menu())
     await state.clear()
-    await callback.answer()
 
 
-@dp.callback_query(F.data == "edit")
 async def edit_feedback(callback: CallbackQuery, state: FSMContext):
     """Редактирование фидбека."""
     await state.set_state(FeedbackState.waiting_rating)
     
     text = "🔄 Начинаем заново. Выберите оценку:"
-    await callback.message.edit_text(text, reply_markup=get_rating_keyboard())
-    await callback.answer()
+    await _edit_message(callback, text, get_rating_keyboard())
 
 
-@dp.callback_query(F.data == "cancel")
 async def cancel_feedback(callback: CallbackQuery, state: FSMContext):
     """Отмена фидбека."""
     await state.clear()
     
     text = "❌ Сбор отзыва отменен.\n\nВы всегда можете начать заново."
-    await callback.message.edit_text(text, reply_markup=get_main_menu())
-    await callback.answer()
+    await _edit_message(callback, text, get_main_menu())
 
 
 # ==================== ДОПОЛНИТЕЛЬНЫЕ КНОПКИ ====================
-@dp.callback_query(F.data == "show_stats")
-async def show_stats(callback: CallbackQuery):
+async def show_stats(callback: CallbackQuery, state: FSMContext):
     """Показ статистики."""
-    stats = sheets_manager.get_stats()
-    
-    text = f"""📊 Текущая статистика отзывов
-
-            📈 Всего отзывов: {stats['total']}
-            ⭐ Средняя оценка: {stats['average']}/5
-            🕒 Последний отзыв: {stats['last_feedback']}
-
-            🔗 Таблица с данными:
-            https://docs.google.com/spreadsheets/d/{Config.SPREADSHEET_ID}
-
-            Данные обновляются автоматически при каждом новом отзыве!"""
+    # get_stats может перечитать таблицу — выполняем в потоке, не блокируя event loop
+    stats = await asyncio.to_thread(sheets_manager.get_stats)
     
-    await callback.message.edit_text(text, reply_markup=get_main_menu())
-    await callback.answer()
+    text = CURRENT_STATS_TEMPLATE.format(**stats)
+    await _edit_message(callback, text, get_main_menu())
 
 
-@dp.callback_query(F.data == "about")
-async def about_project(callback: CallbackQuery):
+async def about_project(callback: CallbackQuery, state: FSMContext):
     """О проекте."""
-    text = """ℹ️ О проекте
-
-            🚀 Умный инструмент для сбора обратной связи
-
-            ✨ Технологии:
-            • Python и Aiogram 3.x
-            • Google Sheets API
-            • Асинхронная архитектура
-            • Система состояний (FSM)
-
-            🎯 Преимущества:
-            • Повышение лояльности клиентов
-            • Автоматизация сбора отзывов
-            • Удобный интерфейс для клиентов
-            • Интеграция с Google экосистемой
-
-            📊 Все данные сохраняются в Google Таблицу в реальном времени!
-
-            🔗 Ссылка на демо-таблицу:
-            https://docs.google.com/spreadsheets/d/{Config.SPREADSHEET_ID}"""
-    
-    # Вставляем реальный ID таблицы
-    text = text.replace("{Config.SPREADSHEET_ID}", Config.SPREADSHEET_ID)
+    await _edit_message(callback, ABOUT_TEXT, get_main_menu())
+
+
+# ==================== МАРШРУТИЗАЦИЯ КНОПОК ====================
+# callback_data → обработчик: одна проверка фильтра и один поиск в словаре
+# вместо перебора фильтров всех обработчиков
+_CALLBACK_HANDLERS = MappingProxyType({
+    "start_feedback": start_feedback,
+    **dict.fromkeys(_RATINGS, process_rating),
+    **dict.fromkeys(_TYPES, process_type),
+    "submit": submit_feedback,
+    "edit": edit_feedback,
+    "cancel": cancel_feedback,
+    "show_stats": show_stats,
+    "about": about_project
+})
+
+
+@dp.callback_query(F.data.in_(_CALLBACK_HANDLERS))
+async def dispatch_callback(callback: CallbackQuery, state: FSMContext):
+    """Единая точка входа для нажатий кнопок."""
+    _answer_callback(callback)
+    await _CALLBACK_HANDLERS[callback.data](callback, state)
+
+
+# ==================== ФОНОВОЕ СОХРАНЕНИЕ ====================
+# ADMIN_ID не меняется во время работы: вариант уведомления выбирается один раз
+if config.ADMIN_ID:
+    async def _notify_admin(bot: Bot, saved: list):
+        """Уведомление админа о сохраненных отзывах [(user_info, data), ...]."""
+        # Отправляем одновременно, а не по одному;
+        # return_exceptions — ошибка отправки не мешает остальным
+        results = await asyncio.gather(
+            *(
+                bot.send_message(config.ADMIN_ID, _admin_notification(user_info, data))
+                for user_info, data in saved
+            ),
+            return_exceptions=True
+        )
+        _check_sent(results, "уведомить админа")
     
-    await callback.message.edit_text(text, reply_markup=get_main_menu())
-    await callback.answer()
+    def _admin_notification(user_info: dict, data: dict) -> str:
+        """Текст уведомления об одном отзыве; неполные данные не мешают остальным."""
+        return ADMIN_NOTIFICATION_TEMPLATE.format(
+            username=user_info.get('username') or 'без username',
+            rating=data.get('rating', '—'),
+            type=data.get('type', '—'),
+            comment=(data.get('comment') or 'Нет комментария')[:100]
+        )
+else:
+    async def _notify_admin(bot: Bot, saved: list):
+        """Админ не задан — уведомлять некого."""
+        return None
+
+
+async def _notify_rejected(bot: Bot, rejected: list):
+    """Сообщение пользователям, чьи отзывы [(user_info, data), ...] не сохранены."""
+    results = await asyncio.gather(
+        *(
+            bot.send_message(user_info["id"], SUBMIT_FAILED_TEXT, reply_markup=get_main_menu())
+            for user_info, _ in rejected
+        ),
+        return_exceptions=True
+    )
+    _check_sent(results, "сообщить пользователю о несохраненном отзыве")
+
+
+def _check_sent(results: list, action: str):
+    """Разбор результатов gather отправки сообщений."""
+    for result in results:
+        # Ошибки Telegram только логируем, остальное (включая отмену) — пробрасываем
+        if isinstance(result, TelegramAPIError):
+            logger.warning(f"⚠️ Не удалось {action}: {result}")
+        elif isinstance(result, BaseException):
+            raise result
+
+
+async def _sheets_worker(bot: Bot):
+    """Сохранение отзывов из очереди пачками и уведомления от имени bot."""
+    while True:
+        # Ждем первый отзыв и забираем все, что успело накопиться, —
+        # одна пачка дает один вызов в поток и одну транзакцию буфера
+        batch = [await feedback_queue.get()]
+        while len(batch) < config.FEEDBACK_BATCH_SIZE and not feedback_queue.empty():
+            batch.append(feedback_queue.get_nowait())
+        try:
+            try:
+                # save_feedback_batch синхронный — выполняем в потоке, не блокируя event loop
+                results = await asyncio.to_thread(sheets_manager.save_feedback_batch, batch)
+            except Exception as e:
+                # Воркер не должен останавливаться из-за одной пачки
+                logger.exception(f"❌ Ошибка сохранения отзывов: {e}")
+                results = [False] * len(batch)
+            
+            # Админу — о сохраненных (дубли уже были), пользователям —
+            # о тех, что не удалось принять (проверка в submit_feedback
+            # могла разойтись с записью, например при ошибке буфера)
+            await asyncio.gather(
+                _notify_admin(bot, [item for item, result in zip(batch, results) if result is True]),
+                _notify_rejected(bot, [item for item, result in zip(batch, results) if result is False])
+            )
+        except Exception as e:
+            logger.exception(f"❌ Ошибка отправки уведомлений: {e}")
+        finally:
+            for _ in batch:
+                feedback_queue.task_done()
 
 
 # ==================== ЗАПУСК ====================
 async def main():
     """Запуск бота."""
-    print("🚀 Запуск Feedback Collector Bot...")
-    print(f"👤 Администратор: {Config.ADMIN_ID}")
-    print(f"📊 Таблица: https://docs.google.com/spreadsheets/d/{Config.SPREADSHEET_ID}")
+    setup_logging()
+    
+    # Вывод идет через очередь логирования и не блокирует event loop
+    logger.info("🚀 Запуск Feedback Collector Bot...")
+    logger.info(f"👤 Администратор: {config.ADMIN_ID}")
+    logger.info(f"📊 Таблица: {SPREADSHEET_URL}")
     
-    # Подключаемся к Google Sheets
-    sheets_manager.connect()
+    # Подключаемся к Google Sheets (в потоке — connect делает сетевые запросы)
+    # одновременно с запросом данных бота: bot.me() кэширует ответ getMe,
+    # и start_polling уже не ждет его
+    async with asyncio.TaskGroup() as tg:
+        tg.create_task(asyncio.to_thread(sheets_manager.connect))
+        tg.create_task(bot.me())
     
-    print("✅ Бот запущен и готов к работе!")
-    print("➡️ Перейдите в Telegram и начните общение с ботом")
+    logger.info("✅ Бот запущен и готов к работе!")
+    logger.info("➡️ Перейдите в Telegram и начните общение с ботом")
+    
+    worker = asyncio.create_task(_sheets_worker(bot))
     
     # Запускаем бота
-    await dp.start_polling(bot)
+    try:
+        await dp.start_polling(bot)
+    finally:
+        # Сохраняем отзывы, принятые до остановки
+        await feedback_queue.join()
+        worker.cancel()
+        
+        # Дописываем в таблицу отзывы, оставшиеся в буфере
+        await asyncio.to_thread(sheets_manager.flush)
+        
+        # Закрываем хранилище состояний (соединения с Redis)
+        await dp.storage.close()
 
 
 if __name__ == "__main__":
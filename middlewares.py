@@ -0,0 +1,38 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict
+from weakref import WeakValueDictionary
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject
+
+
+class PerChatConcurrencyMiddleware(BaseMiddleware):
+    """Последовательная обработка апдейтов одного чата.
+
+    Апдейты разных чатов обрабатываются параллельно, апдейты одного чата —
+    строго по очереди, поэтому медленный обработчик задерживает только свой чат.
+    """
+
+    def __init__(self):
+        # Блокировка живет, пока ее держит или ждет хотя бы один апдейт
+        self._locks: WeakValueDictionary = WeakValueDictionary()
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        # Чат и пользователя уже определил UserContextMiddleware диспетчера
+        chat = data.get("event_chat")
+        user = data.get("event_from_user")
+        key = chat.id if chat is not None else user.id if user is not None else None
+        if key is None:
+            return await handler(event, data)
+
+        lock = self._locks.get(key)
+        if lock is None:
+            lock = self._locks[key] = asyncio.Lock()
+
+        async with lock:
+            return await handler(event, data)